@@ -13,10 +13,16 @@ app.secret_key = os.getenv('FLASK_SECRET_KEY', 'your_default_secret_key')
 from blueprints.auth import auth_bp
 from blueprints.api import api_bp
 from blueprints.base import base_bp
+from blueprints.metrics import metrics_bp
+from blueprints.profiling import profiling_bp
+from blueprints.assets import assets_bp
 
 app.register_blueprint(auth_bp)
 app.register_blueprint(api_bp, url_prefix='/api')
 app.register_blueprint(base_bp)
+app.register_blueprint(metrics_bp)
+app.register_blueprint(profiling_bp)
+app.register_blueprint(assets_bp)
 
 if __name__ == '__main__':
     app.run(debug=False)
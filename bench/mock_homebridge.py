@@ -0,0 +1,268 @@
+"""
+Local stand-in for a Homebridge UI server, for benchmarks and manual testing.
+
+Emulates the REST endpoints HomeBridgeClient uses:
+    POST /api/auth/login
+    GET  /api/accessories
+    GET  /api/accessories/layout
+    GET  /api/accessories/<uniqueId>
+    PUT  /api/accessories/<uniqueId>
+
+and, with `live=True`, the socket.io `/accessories` namespace
+(`get-accessories` -> `accessories-data`, plus a push after every PUT).
+`remove_accessory()`, `reload_required()` and `disconnect_clients()`
+drive resyncs and reconnects from tests.
+The socket.io side needs `python-socketio` and `simple-websocket`.
+
+    python -m bench.mock_homebridge --accessories 200 --latency 0.02 --failure-rate 0.01
+"""
+import argparse
+import hashlib
+import random
+import threading
+import time
+from typing import Dict, List, Optional
+
+from flask import Flask, jsonify, request
+from werkzeug.serving import WSGIRequestHandler, make_server
+
+DEVICE_TYPES = {
+    'Lightbulb': [
+        ('On', 'bool', True, None, None, None, False),
+        ('Brightness', 'int', True, 0, 100, 1, 100),
+        ('Hue', 'float', True, 0, 360, 1, 0),
+        ('Saturation', 'float', True, 0, 100, 1, 0),
+    ],
+    'Switch': [
+        ('On', 'bool', True, None, None, None, False),
+    ],
+    'GarageDoorOpener': [
+        ('CurrentDoorState', 'uint8', False, 0, 4, 1, 1),
+        ('TargetDoorState', 'uint8', True, 0, 1, 1, 1),
+        ('ObstructionDetected', 'bool', False, None, None, None, False),
+    ],
+}
+
+INSTANCE = {
+    'name': 'Mock Bridge',
+    'username': '0E:00:00:00:00:01',
+    'ipAddress': '127.0.0.1',
+    'port': 51826,
+    'services': [],
+    'connectionFailedCount': 0
+}
+
+
+def make_accessory(index: int, device_type: str) -> dict:
+    unique_id = hashlib.sha256(f'mock-{index}'.encode()).hexdigest()
+    name = f'{device_type} {index}'
+    characteristics = []
+    for iid, (char_type, fmt, writable, min_value, max_value, min_step, value) in enumerate(DEVICE_TYPES[device_type], 10):
+        characteristics.append({
+            'aid': index + 2, 'iid': iid, 'uuid': f'{iid:08X}-0000-1000-8000-0026BB765291',
+            'type': char_type, 'serviceType': device_type, 'serviceName': name,
+            'description': char_type, 'value': value, 'format': fmt,
+            'perms': ['ev', 'pr', 'pw'] if writable else ['ev', 'pr'],
+            'canRead': True, 'canWrite': writable, 'ev': True,
+            'minValue': min_value, 'maxValue': max_value, 'minStep': min_step,
+        })
+    return {
+        'aid': index + 2, 'iid': 8, 'uuid': '00000043-0000-1000-8000-0026BB765291',
+        'type': device_type, 'humanType': device_type, 'serviceName': name,
+        'serviceCharacteristics': characteristics,
+        'accessoryInformation': {
+            'Manufacturer': 'Mock', 'Model': device_type, 'Name': name,
+            'Serial Number': unique_id[:12], 'Firmware Revision': '1.0.0'
+        },
+        'values': {c['type']: c['value'] for c in characteristics},
+        'instance': INSTANCE,
+        'uniqueId': unique_id
+    }
+
+
+class QuietRequestHandler(WSGIRequestHandler):
+    """Skips werkzeug's per-request access log; a bench run makes thousands."""
+    def log_request(self, *args, **kwargs):
+        pass
+
+
+class MockHomebridge:
+    """
+    In-memory bridge with `accessory_count` accessories. `rooms` maps room
+    name -> number of accessories in it; accessories not placed in a
+    room go into 'Default Room'. Every request sleeps `latency` seconds
+    and fails with a 503 at `failure_rate`.
+    """
+    def __init__(self, accessory_count: int = 50, rooms: Optional[Dict[str, int]] = None,
+                 latency: float = 0, failure_rate: float = 0, token_lifetime: int = 28800,
+                 live: bool = False):
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.token_lifetime = token_lifetime
+        self.lock = threading.Lock()
+        self.requests = 0
+
+        types = list(DEVICE_TYPES)
+        self.accessories: Dict[str, dict] = {}
+        for i in range(accessory_count):
+            accessory = make_accessory(i, types[i % len(types)])
+            self.accessories[accessory['uniqueId']] = accessory
+
+        ids = list(self.accessories)
+        self.layout: List[dict] = []
+        for name, size in (rooms or {}).items():
+            self.layout.append({'name': name, 'services': [self._service_ref(i) for i in ids[:size]]})
+            ids = ids[size:]
+        if ids:
+            self.layout.append({'name': 'Default Room', 'services': [self._service_ref(i) for i in ids]})
+
+        self.app = Flask(__name__)
+        self._routes()
+        self.sids = set()
+        self.sio = self._socketio() if live else None
+        self.wsgi_app = self.app
+        if self.sio is not None:
+            import socketio
+            self.wsgi_app = socketio.WSGIApp(self.sio, self.app)
+        self._server = None
+
+    def _service_ref(self, unique_id: str) -> dict:
+        a = self.accessories[unique_id]
+        return {'uniqueId': unique_id, 'aid': a['aid'], 'iid': a['iid'], 'uuid': a['uuid']}
+
+    def _routes(self):
+        app = self.app
+
+        @app.before_request
+        def simulate_network():
+            with self.lock:
+                self.requests += 1
+            if self.latency:
+                time.sleep(self.latency)
+            if self.failure_rate and random.random() < self.failure_rate:
+                return jsonify({'message': 'mock failure'}), 503
+            if request.path != '/api/auth/login' and not request.headers.get('Authorization', '').startswith('Bearer '):
+                return jsonify({'message': 'Unauthorized'}), 401
+
+        @app.route('/api/auth/login', methods=['POST'])
+        def login():
+            return jsonify({
+                'access_token': f'mock-{time.time()}',
+                'token_type': 'Bearer',
+                'expires_in': self.token_lifetime
+            }), 201
+
+        @app.route('/api/accessories')
+        def accessories():
+            with self.lock:
+                return jsonify(list(self.accessories.values()))
+
+        @app.route('/api/accessories/layout')
+        def layout():
+            return jsonify(self.layout)
+
+        @app.route('/api/accessories/<unique_id>', methods=['GET'])
+        def accessory(unique_id):
+            with self.lock:
+                if unique_id not in self.accessories:
+                    return jsonify({'message': 'Not Found'}), 404
+                return jsonify(self.accessories[unique_id])
+
+        @app.route('/api/accessories/<unique_id>', methods=['PUT'])
+        def set_characteristic(unique_id):
+            body = request.get_json()
+            updated = self.set_value(unique_id, body['characteristicType'], body['value'])
+            if updated is None:
+                return jsonify({'message': 'Not Found'}), 404
+            return jsonify(updated)
+
+    def set_value(self, unique_id: str, char_type: str, value, push: bool = True) -> Optional[dict]:
+        """
+        Sets a value like a device would; replaces (never mutates) the
+        accessory json. `push=False` skips the socket.io update.
+        """
+        with self.lock:
+            accessory = self.accessories.get(unique_id)
+            if accessory is None:
+                return None
+            accessory = dict(accessory)
+            accessory['values'] = {**accessory['values'], char_type: value}
+            if char_type == 'TargetDoorState':
+                accessory['values']['CurrentDoorState'] = value
+            accessory['serviceCharacteristics'] = [
+                {**c, 'value': accessory['values'][c['type']]} for c in accessory['serviceCharacteristics']
+            ]
+            self.accessories[unique_id] = accessory
+        if push and self.sio is not None:
+            self.sio.emit('accessories-data', [accessory], namespace='/accessories')
+        return accessory
+
+    def _socketio(self):
+        import socketio
+        sio = socketio.Server(async_mode='threading')
+
+        @sio.on('connect', namespace='/accessories')
+        def connect(sid, environ, *args):
+            with self.lock:
+                self.sids.add(sid)
+
+        @sio.on('disconnect', namespace='/accessories')
+        def disconnect(sid, *args):
+            with self.lock:
+                self.sids.discard(sid)
+
+        @sio.on('get-accessories', namespace='/accessories')
+        def get_accessories(sid, *args):
+            with self.lock:
+                data = list(self.accessories.values())
+            sio.emit('accessories-data', data, to=sid, namespace='/accessories')
+
+        return sio
+
+    def remove_accessory(self, unique_id: str):
+        """Unpairs an accessory; live clients hear nothing until reload_required()."""
+        with self.lock:
+            del self.accessories[unique_id]
+            self.layout = [
+                {**room, 'services': [s for s in room['services'] if s['uniqueId'] != unique_id]}
+                for room in self.layout
+            ]
+
+    def reload_required(self):
+        """Tells live clients their accessory list is out of date."""
+        self.sio.emit('accessories-reload-required', namespace='/accessories')
+
+    def disconnect_clients(self):
+        with self.lock:
+            sids = list(self.sids)
+        for sid in sids:
+            self.sio.disconnect(sid, namespace='/accessories')
+
+    @property
+    def url(self) -> str:
+        return f'http://127.0.0.1:{self._server.server_port}'
+
+    def start(self, port: int = 0) -> str:
+        """Serves in a background thread; returns the base url."""
+        self._server = make_server('127.0.0.1', port, self.wsgi_app, threaded=True,
+                                   request_handler=QuietRequestHandler)
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self.url
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--port', type=int, default=8581)
+    parser.add_argument('--accessories', type=int, default=50)
+    parser.add_argument('--latency', type=float, default=0)
+    parser.add_argument('--failure-rate', type=float, default=0)
+    parser.add_argument('--live', action='store_true', help='serve the socket.io event stream too')
+    args = parser.parse_args()
+
+    mock = MockHomebridge(args.accessories, latency=args.latency, failure_rate=args.failure_rate, live=args.live)
+    print(f'mock homebridge on {mock.start(args.port)}')
+    threading.Event().wait()
@@ -0,0 +1,181 @@
+"""
+End-to-end benchmarks for the api_bp routes against a local mock Homebridge.
+
+Runs the real Flask app (via its test client) against MockHomebridge over
+HTTP and reports p50/p99 latency and throughput for:
+
+    GET  /api/rooms
+    GET  /api/rooms/<room>/devices
+    GET  /api/devices?room=<room>
+    POST /api/device/<id>
+    GET  /api/actions/<name>/run
+
+at several room and action sizes. Save a run with --save and compare a
+later one against it with --baseline to check a change.
+
+    python -m bench.run_bench --latency 0.005 --save baseline.json
+    python -m bench.run_bench --latency 0.005 --baseline baseline.json
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from bench.mock_homebridge import MockHomebridge
+
+SIZES = [1, 5, 20, 50]
+
+
+def percentile(samples: List[float], p: float) -> float:
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, round(p / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def measure(call: Callable[[], None], iterations: int, concurrency: int) -> Dict[str, float]:
+    def timed(_):
+        started = time.perf_counter()
+        call()
+        return time.perf_counter() - started
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        samples = list(pool.map(timed, range(iterations)))
+    elapsed = time.perf_counter() - started
+    return {
+        'p50_ms': statistics.median(samples) * 1000,
+        'p99_ms': percentile(samples, 99) * 1000,
+        'rps': iterations / elapsed,
+    }
+
+
+def build_app(mock: MockHomebridge, workdir: str, live: bool):
+    """Imports the app wired to `mock`, with its own auth db and actions file."""
+    os.environ.update({
+        'HOME_BRIDGE_HOST': mock.url,
+        'HOME_BRIDGE_USER': 'bench',
+        'HOME_BRIDGE_PASSWORD': 'bench',
+        'AUTH_LOG_SAMPLE_RATE': '0',
+    })
+    os.chdir(workdir)
+
+    from homebridge.client import get_shared_client
+    # created first so the blueprints pick up this client and its live setting
+    client = get_shared_client(mock.url, 'bench', 'bench', live_updates=live)
+
+    from app import app
+    from blueprints import api
+    api.user_manager.add_user('bench', 'bench', 2)
+    api.user_manager.add_api_key('bench', 'bench-key')
+    return app, api, client
+
+
+def run(args) -> Dict[str, Dict[str, float]]:
+    rooms = {f'room-{n}': n for n in SIZES}
+    mock = MockHomebridge(
+        accessory_count=max(args.accessories, sum(SIZES)), rooms=rooms,
+        latency=args.latency, failure_rate=args.failure_rate, live=args.live
+    )
+    mock.start()
+
+    workdir = tempfile.mkdtemp(prefix='homeadmin-bench-')
+    app, api, client = build_app(mock, workdir, args.live)
+    if args.live:
+        deadline = time.monotonic() + 10
+        while not client.state.synced and time.monotonic() < deadline:
+            time.sleep(0.05)
+
+    http = app.test_client()
+    headers = {'X-Api-Key': 'bench-key'}
+
+    def get(path: str):
+        def call():
+            response = http.get(path, headers=headers)
+            assert response.status_code < 500, (path, response.status_code, response.data[:200])
+        return call
+
+    def post(path: str, body: dict):
+        def call():
+            response = http.post(path, headers=headers, json=body)
+            assert response.status_code < 500, (path, response.status_code, response.data[:200])
+        return call
+
+    layout = {room['name']: room['services'] for room in mock.layout}
+    results = {}
+    results['GET /api/rooms'] = measure(get('/api/rooms'), args.iterations, args.concurrency)
+    for n in SIZES:
+        results[f'GET /api/rooms/<room> [{n} devices]'] = measure(
+            get(f'/api/rooms/room-{n}/devices'), args.iterations, args.concurrency
+        )
+        results[f'GET /api/devices?room= [{n} devices]'] = measure(
+            get(f'/api/devices?room=room-{n}'), args.iterations, args.concurrency
+        )
+
+    switch_id = next(a['uniqueId'] for a in mock.accessories.values() if a['type'] == 'Switch')
+    toggle = iter(range(10 ** 9))
+    results['POST /api/device/<id>'] = measure(
+        lambda: post(f'/api/device/{switch_id}', {'On': next(toggle) % 2})(),
+        args.iterations, args.concurrency
+    )
+
+    for n in SIZES:
+        action = {}
+        for service in layout[f'room-{n}']:
+            device_type = mock.accessories[service['uniqueId']]['type']
+            action[service['uniqueId']] = {'TargetDoorState': 0} if device_type == 'GarageDoorOpener' else {'On': True}
+        api.am.save(f'bench-{n}', action)
+        # force=1 so every run writes; diff mode would skip after the first
+        results[f'GET /api/actions/<name>/run [{n} devices]'] = measure(
+            get(f'/api/actions/bench-{n}/run?force=1'), max(1, args.iterations // 5), 1
+        )
+
+    results['_upstream_requests'] = {'count': mock.requests}
+    mock.stop()
+    return results
+
+
+def report(results: Dict[str, Dict[str, float]], baseline: Dict[str, Dict[str, float]] = None):
+    print(f"{'benchmark':<48}{'p50 ms':>10}{'p99 ms':>10}{'req/s':>10}" + ('   p50 vs baseline' if baseline else ''))
+    for name, r in results.items():
+        if name.startswith('_'):
+            continue
+        line = f"{name:<48}{r['p50_ms']:>10.2f}{r['p99_ms']:>10.2f}{r['rps']:>10.1f}"
+        if baseline and name in baseline:
+            change = (r['p50_ms'] - baseline[name]['p50_ms']) / baseline[name]['p50_ms'] * 100
+            line += f'   {change:+.1f}%'
+        print(line)
+    print(f"upstream requests: {results['_upstream_requests']['count']}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--accessories', type=int, default=200)
+    parser.add_argument('--latency', type=float, default=0.005, help='mock bridge latency per request (s)')
+    parser.add_argument('--failure-rate', type=float, default=0)
+    parser.add_argument('--iterations', type=int, default=200)
+    parser.add_argument('--concurrency', type=int, default=4)
+    parser.add_argument('--live', action='store_true', help='use the socket.io event stream')
+    parser.add_argument('--save', help='write results to this json file')
+    parser.add_argument('--baseline', help='compare against results saved with --save')
+    args = parser.parse_args()
+    # run() switches into a scratch directory
+    args.save = args.save and os.path.abspath(args.save)
+    args.baseline = args.baseline and os.path.abspath(args.baseline)
+
+    results = run(args)
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    report(results, baseline)
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump(results, f, indent=2)
@@ -1,57 +1,117 @@
-from flask import Blueprint, request, jsonify, abort, session
+from flask import Blueprint, Response, request, jsonify, abort, session
 from functools import wraps
-from user_manager import UserManager
-from typing import List
+from blueprints.metrics import track_requests
+from blueprints.profiling import profile_requests
+import json
+import logging
+import os
+import queue
+import random
+import requests
+import threading
+from user_manager import UserManager, hash_api_key
 
 api_bp = Blueprint('api', __name__)
+track_requests(api_bp)
+profile_requests(api_bp)
 
 user_manager = UserManager()
 
+logger = logging.getLogger(__name__)
+# fraction of successful API key authentications that get logged;
+# failures are always logged
+AUTH_LOG_SAMPLE_RATE = float(os.getenv('AUTH_LOG_SAMPLE_RATE', 0.01))
+
+def log_api_key_auth(api_key, username):
+    if username and random.random() >= AUTH_LOG_SAMPLE_RATE:
+        return
+    logger.info(
+        'api_key_auth result=%s user=%s key=%s path=%s',
+        'ok' if username else 'denied', username, hash_api_key(api_key)[:8], request.path
+    )
+
 def api_auth_required(f):
     @wraps(f)
     def decorated_function(*args, **kwargs):
         # Check for API key in headers or args
         api_key = request.headers.get('X-Api-Key') or request.args.get('api_key')
         if api_key:
-            print('API KEY',api_key)
             username = user_manager.get_username_for_api_key(api_key)
+            log_api_key_auth(api_key, username)
             if username:
                 # Optionally, you can set session or g.username = username
                 return f(*args, **kwargs)
         # Check for session login
         elif 'username' in session:
             return f(*args, **kwargs)
-        else:
-            return jsonify({'error': 'Unauthorized'}), 401
+        return jsonify({'error': 'Unauthorized'}), 401
     return decorated_function
 
 # Import necessary modules and initialize HomeBridgeClient and ActionManager as in your original code
 
-from homebridge.client import HomeBridgeClient
+from homebridge.client import get_shared_client
 from homebridge.action_manager import ActionManager
-from threading import Thread
-import os
+from homebridge.executor import ActionExecutor
+from homebridge.write_queue import WriteCoalescer
+from homebridge.health import DeviceUnavailableError
+from homebridge.cache import SerializedCache
+from homebridge import encoding
+from homebridge.models import Device, Room
 
 HOME_BRIDGE_HOST = os.getenv('HOME_BRIDGE_HOST')
 HOME_BRIDGE_USER = os.getenv('HOME_BRIDGE_USER')
 HOME_BRIDGE_PASSWORD = os.getenv('HOME_BRIDGE_PASSWORD')
 
-hbc = HomeBridgeClient(
+hbc = get_shared_client(
     HOME_BRIDGE_HOST,
     HOME_BRIDGE_USER,
     HOME_BRIDGE_PASSWORD
 )
 
-am = ActionManager()
+am = ActionManager(client=hbc)
+action_executor = ActionExecutor(
+    hbc,
+    max_workers=int(os.getenv('ACTION_WORKERS', 8)),
+    action_timeout=float(os.getenv('ACTION_TIMEOUT', 30))
+)
+write_queue = WriteCoalescer(hbc)
+serialized = SerializedCache()
+
+# sections `compact=1` leaves out; the dashboard and widgets never read them
+COMPACT_OMIT = frozenset({'instance', 'perms', 'uuid', 'serviceType', 'ev'})
+MAX_BATCH_DEVICES = int(os.getenv('MAX_BATCH_DEVICES', 200))
+# open /api/events streams per process; each one holds a worker thread
+event_stream_slots = threading.BoundedSemaphore(int(os.getenv('EVENT_STREAM_LIMIT', 16)))
+
+
+def cached_json(key, source, build):
+    """
+    JSON response reused while `source` is unchanged, tagged with a
+    strong ETag so conditional requests get a 304.
+
+    Honours `fields=` (comma separated, dotted for nested fields) and
+    `compact=1` (drops nulls and unused sections) query parameters.
+    """
+    fields = request.args.get('fields')
+    is_compact = request.args.get('compact') in ('1', 'true')
+
+    def build_projected():
+        payload = encoding.project(build(), encoding.parse_fields(fields))
+        return encoding.compact(payload, COMPACT_OMIT) if is_compact else payload
+
+    body, etag = serialized.get((key, fields, is_compact), source, build_projected)
+    response = Response(body, mimetype='application/json')
+    response.set_etag(etag)
+    return response.make_conditional(request)
 
 @api_bp.route('/rooms', methods=['GET'])
 @api_auth_required
 def get_rooms():
-    rooms = []
-    for room in hbc.get_accessories_layout():
-        room_dict = room.to_dict()
-        rooms.append(room_dict)
-    return jsonify(rooms)
+    layout = hbc.get_accessories_layout_json()
+    return cached_json(
+        'rooms', layout,
+        lambda: [Room.from_dict(room_json).to_dict() for room_json in layout]
+    )
 
 @api_bp.route('/rooms/<room_name>/devices', methods=['GET'])
 @api_auth_required
@@ -59,37 +119,130 @@ def get_room_devices(room_name: str):
     rooms = hbc.get_accessories_layout()
     for room in rooms:
         if room.name == room_name:
-            devices = []
-            for service in room.services:
-                device = hbc.get_accessory(service.uniqueId)
-                devices.append(device.get_summary())
-            return jsonify(devices)
+            sources = tuple(hbc.get_accessory_json(service.uniqueId) for service in room.services)
+            return cached_json(
+                ('room-devices', room_name), sources,
+                lambda: [Device.from_dict(device_json).get_summary() for device_json in sources]
+            )
     return jsonify([])
 
+@api_bp.route('/devices', methods=['GET'])
+@api_auth_required
+def get_devices():
+    """
+    Several devices in one response, in the same shape as /device/<id>:
+    either `ids` (comma separated uniqueIds) or every device in `room`.
+    """
+    room_name = request.args.get('room')
+    if room_name is not None:
+        room = next((r for r in hbc.get_accessories_layout() if r.name == room_name), None)
+        unique_ids = [service.uniqueId for service in room.services] if room else []
+    else:
+        unique_ids = list(filter(None, request.args.get('ids', '').split(',')))
+    if len(unique_ids) > MAX_BATCH_DEVICES:
+        return jsonify({'error': f'At most {MAX_BATCH_DEVICES} devices per request'}), 400
+
+    sources = tuple(hbc.get_accessories_json(unique_ids))
+    return cached_json(
+        ('devices', tuple(unique_ids)), sources,
+        lambda: [Device.from_dict(device_json).to_dict() for device_json in sources]
+    )
+
 @api_bp.route('/device/<unique_id>', methods=['GET'])
 @api_auth_required
 def get_device(unique_id):
-    device = hbc.get_accessory(unique_id)
-    device_dict = device.to_dict()
-    return jsonify(device_dict)
+    device_json = hbc.get_accessory_json(unique_id)
+    return cached_json(
+        ('device', unique_id), device_json,
+        lambda: Device.from_dict(device_json).to_dict()
+    )
 
 @api_bp.route('/device/<unique_id>', methods=['POST'])
 @api_auth_required
 def update_device(unique_id, data=None):
+    """
+    Validates and queues a characteristic change. Writes to the same
+    device are coalesced, so this acknowledges before the bridge does.
+    """
     if data is None:
         data = request.json
-    device = hbc.get_accessory(unique_id)
-    print(device.serviceName)
-    for char_type, value in data.items():
-        print(char_type, value)
-        device.set_characteristic(char_type, value)
-    updated_device = hbc.update_accessory_characteristic(device)
+    if not isinstance(data, dict) or not data:
+        return jsonify({'error': 'Invalid data'}), 400
+    try:
+        device = write_queue.submit(unique_id, data)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     return jsonify({
-        'status': 'success',
-        'updatedCharacteristics': updated_device.get_characteristics()
-    })
+        'status': 'accepted',
+        'updatedCharacteristics': device.get_characteristics()
+    }), 202
+
+
+
+@api_bp.route('/events', methods=['GET'])
+@api_auth_required
+def device_events():
+    """
+    Server-Sent Events stream of characteristic changes for the devices
+    listed in `ids` (comma separated uniqueIds). Each event carries only
+    the values that changed since the last event sent to this client.
 
+    Each stream holds a worker thread, so at most EVENT_STREAM_LIMIT are
+    open at once. Without a synced live feed there is nothing to stream:
+    204 tells the browser not to reconnect.
+    """
+    if not hbc.state.synced:
+        return '', 204
+    if not event_stream_slots.acquire(blocking=False):
+        return jsonify({'error': 'Too many open event streams'}), 503, {'Retry-After': '30'}
 
+    ids = set(filter(None, request.args.get('ids', '').split(',')))
+    updates: queue.Queue = queue.Queue(maxsize=100)
+
+    def on_update(accessories):
+        try:
+            updates.put_nowait(accessories)
+        except queue.Full:
+            # later pushes carry full values, so the next delta catches up
+            pass
+
+    snapshot = hbc.state.snapshot()
+    last_sent = {i: dict(snapshot[i]['values']) for i in ids if i in snapshot}
+
+    def stream():
+        hbc.state.add_listener(on_update)
+        try:
+            yield 'retry: 5000\n\n'
+            while True:
+                try:
+                    accessories = updates.get(timeout=15)
+                except queue.Empty:
+                    if not hbc.state.synced:
+                        # feed lost; the reconnect gets a 204 until it's back
+                        return
+                    # keeps proxies from closing an idle connection
+                    yield ': keep-alive\n\n'
+                    continue
+                for accessory in accessories:
+                    unique_id = accessory['uniqueId']
+                    if unique_id not in ids:
+                        continue
+                    previous = last_sent.setdefault(unique_id, {})
+                    delta = {k: v for k, v in accessory['values'].items() if previous.get(k) != v}
+                    if not delta:
+                        continue
+                    previous.update(delta)
+                    yield f"data: {json.dumps({'uniqueId': unique_id, 'values': delta})}\n\n"
+        finally:
+            hbc.state.remove_listener(on_update)
+
+    response = Response(stream(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+    # runs even if the client went away before the stream started
+    response.call_on_close(event_stream_slots.release)
+    return response
 
 @api_bp.route('/actions', methods=['GET'])
 @api_auth_required
@@ -114,7 +267,10 @@ def save_action(action_name):
     action_data = request.get_json()
     if not action_data:
         return jsonify({'error': 'Invalid data'}), 400
-    am.save(action_name, action_data)
+    try:
+        am.save(action_name, action_data)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     return jsonify({'message': 'Action saved successfully'})
 
 
@@ -122,41 +278,36 @@ def save_action(action_name):
 @api_bp.route('/actions/<action_name>/run')
 @api_auth_required
 def run_action(action_name):
-    updated_devices = []
-
-    def do_update_device_threaded(unique_id,data):
-        if data is None:
-            data = request.json
-        device = hbc.get_accessory(unique_id)
-        for char_type, value in data.items():
-            device.set_characteristic(char_type, value)
-        updated_device = hbc.update_accessory_characteristic(device)
-        if updated_device:
-            updated_devices.append(updated_device.serviceName)
+    plan = am.get_plan(action_name)
+    if plan is None:
+        return jsonify({'error': 'Action not found'}), 404
+
+    # ?force=1 writes every characteristic, even ones already at their target
+    report = action_executor.run(plan, diff=request.args.get('force') not in ('1', 'true'))
+    return jsonify(report.to_dict())
+
 
-    action = am.get(action_name)
-    threads: List[Thread] = []
-
-    # thread off updates (this is slow for big action groups otherwise)
-    for device, updates in action.items():
-        threads.append(Thread(
-                target=do_update_device_threaded, 
-                args=(device, updates, updated_devices)
-        ))
-        threads[-1].start()
-
-    for t in threads:
-        t.join()
-
-    # Will throw on failure
-    return jsonify(
-        {
-            'status': 'success',
-            'msg': f'{action_name} applied changes to {len(updated_devices)} device(s)'
-        }
-    )
 
+@api_bp.errorhandler(DeviceUnavailableError)
+def handle_device_unavailable(e):
+    return jsonify({
+        'status': 'error',
+        'message': str(e)
+    }), 503
 
+@api_bp.errorhandler(requests.RequestException)
+def handle_bridge_unavailable(e):
+    status = e.response.status_code if isinstance(e, requests.HTTPError) and e.response is not None else None
+    if status == 404:
+        return jsonify({
+            'status': 'error',
+            'message': 'Device not found'
+        }), 404
+    logger.warning('homebridge request failed on %s: %s', request.path, e)
+    return jsonify({
+        'status': 'error',
+        'message': 'Homebridge is unavailable'
+    }), 502
 
 @api_bp.errorhandler(Exception)
 def handle_exception(e):
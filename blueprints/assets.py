@@ -0,0 +1,53 @@
+from flask import Blueprint, current_app, request, url_for
+import hashlib
+import os
+
+assets_bp = Blueprint('assets', __name__)
+
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+DEVICE_SCRIPTS_DIR = 'js/devices'
+
+# filename -> (mtime_ns, size, digest)
+_fingerprints = {}
+
+def fingerprint(filename: str) -> str:
+    """Short content hash of a static file, recomputed when it changes."""
+    path = os.path.join(current_app.static_folder, filename)
+    stat = os.stat(path)
+    cached = _fingerprints.get(filename)
+    if cached and cached[:2] == (stat.st_mtime_ns, stat.st_size):
+        return cached[2]
+    with open(path, 'rb') as f:
+        digest = hashlib.blake2b(f.read(), digest_size=8).hexdigest()
+    _fingerprints[filename] = (stat.st_mtime_ns, stat.st_size, digest)
+    return digest
+
+@assets_bp.app_template_global()
+def static_url(filename: str) -> str:
+    """URL of a static file that changes whenever its content does."""
+    return url_for('static', filename=filename, v=fingerprint(filename))
+
+@assets_bp.app_template_global()
+def device_script_urls() -> dict:
+    """Fingerprinted control script URL per device type."""
+    folder = os.path.join(current_app.static_folder, DEVICE_SCRIPTS_DIR)
+    return {
+        name[:-len('.js')]: static_url(f'{DEVICE_SCRIPTS_DIR}/{name}')
+        for name in sorted(os.listdir(folder)) if name.endswith('.js')
+    }
+
+@assets_bp.after_app_request
+def cache_fingerprinted_assets(response):
+    """
+    Static files requested with their current fingerprint never change
+    under that URL, so browsers may keep them without revalidating.
+    """
+    version = request.args.get('v')
+    if request.endpoint == 'static' and version and response.status_code in (200, 304):
+        try:
+            current = fingerprint(request.view_args['filename'])
+        except OSError:
+            return response
+        if version == current:
+            response.headers['Cache-Control'] = IMMUTABLE_CACHE_CONTROL
+    return response
@@ -74,10 +74,10 @@ def api_keys():
         if action == 'generate_api_key':
             new_api_key = str(uuid.uuid4())
             user_manager.add_api_key(username, new_api_key)
-            flash('New API key generated.', 'success')
+            # only the digest is stored, so this is the one chance to copy it
+            flash(f'New API key generated: {new_api_key} (copy it now, it will not be shown again)', 'success')
         elif action == 'revoke_api_key':
-            api_key = request.form['api_key']
-            user_manager.remove_api_key(api_key)
+            user_manager.remove_api_key_hash(request.form['key_hash'], username)
             flash('API key revoked.', 'success')
     api_keys = user_manager.list_api_keys_for_user(username)
     return render_template('auth/api_keys.html', api_keys=api_keys)
@@ -1,18 +1,23 @@
 from flask import Blueprint, render_template, request
 from flask import session, redirect, url_for
 from functools import wraps
+from blueprints.metrics import track_requests
+from blueprints.profiling import profile_requests
 from user_manager import UserManager
-from homebridge.client import HomeBridgeClient
+from homebridge.client import get_shared_client
+from homebridge.models import Device
 import os
 from homebridge.action_manager import ActionManager
 
 base_bp = Blueprint('base', __name__, template_folder='../templates')
+track_requests(base_bp)
+profile_requests(base_bp)
 
 HOME_BRIDGE_HOST = os.getenv('HOME_BRIDGE_HOST')
 HOME_BRIDGE_USER = os.getenv('HOME_BRIDGE_USER')
 HOME_BRIDGE_PASSWORD = os.getenv('HOME_BRIDGE_PASSWORD')
 
-hbc = HomeBridgeClient(
+hbc = get_shared_client(
     HOME_BRIDGE_HOST,
     HOME_BRIDGE_USER,
     HOME_BRIDGE_PASSWORD
@@ -48,11 +53,17 @@ def room(room_name):
     action_recording = request.args.get('recordAction')
     for room in rooms:
         if room.name == room_name:
-            for service in room.services:
-                device = hbc.get_accessory(service.uniqueId)
-                devices.append(device)
+            unique_ids = [service.uniqueId for service in room.services]
+            devices = [Device.from_dict(device_json) for device_json in hbc.get_accessories_json(unique_ids)]
             break
-    return render_template('room.html', room_name=room_name, devices=devices, action_recording=action_recording)
+    return render_template(
+        'room.html',
+        room_name=room_name,
+        devices=devices,
+        # embedded so the page doesn't fetch the same devices again
+        device_data=[device.to_dict() for device in devices],
+        action_recording=action_recording
+    )
 
 @base_bp.route('/action/<action_name>')
 @login_required
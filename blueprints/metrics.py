@@ -0,0 +1,47 @@
+from flask import Blueprint, Response, g, jsonify, request, session
+import os
+import time
+from blueprints.auth import user_manager
+from homebridge import metrics
+
+metrics_bp = Blueprint('metrics', __name__)
+
+# scrapers allowed without credentials (comma separated addresses as seen
+# in request.remote_addr, so the proxy's address when behind one)
+METRICS_ALLOWED_IPS = frozenset(filter(None, os.getenv('METRICS_ALLOWED_IPS', '').split(',')))
+
+def metrics_access_allowed() -> bool:
+    """Allow-listed scrapers, API keys (X-Api-Key or Bearer) and admins."""
+    if request.remote_addr in METRICS_ALLOWED_IPS:
+        return True
+    api_key = request.headers.get('X-Api-Key')
+    authorization = request.headers.get('Authorization', '')
+    if not api_key and authorization.startswith('Bearer '):
+        api_key = authorization[len('Bearer '):]
+    if api_key:
+        return user_manager.get_username_for_api_key(api_key) is not None
+    user = user_manager.get_user(session.get('username'))
+    return bool(user) and user['usertype'] == 2
+
+def track_requests(bp: Blueprint):
+    """Records per-route latency for every request handled by `bp`."""
+    @bp.before_request
+    def start_timer():
+        g.request_started = time.perf_counter()
+
+    @bp.after_request
+    def record_latency(response):
+        started = g.pop('request_started', None)
+        if started is not None:
+            metrics.route_latency.observe(
+                time.perf_counter() - started,
+                request.endpoint or 'unknown', request.method, str(response.status_code)
+            )
+        return response
+
+@metrics_bp.route('/metrics')
+def prometheus_metrics():
+    """Prometheus text exposition of upstream, cache and route metrics."""
+    if not metrics_access_allowed():
+        return jsonify({'error': 'Unauthorized'}), 401
+    return Response(metrics.REGISTRY.expose(), mimetype='text/plain; version=0.0.4')
@@ -0,0 +1,117 @@
+from flask import Blueprint, abort, g, render_template, request, session, template_rendered, before_render_template
+from collections import deque
+import cProfile
+import io
+import pstats
+import threading
+import time
+import uuid
+from blueprints.auth import admin_required, user_manager
+from homebridge import tracing
+
+profiling_bp = Blueprint('profiling', __name__, template_folder='../templates')
+
+MAX_PROFILES = 20
+PROFILE_STATS_LINES = 40
+
+_profiles = deque(maxlen=MAX_PROFILES)
+_profiles_lock = threading.Lock()
+# cProfile hooks the interpreter globally, so only one request is profiled at a time
+_profiler_lock = threading.Lock()
+
+
+def _is_admin() -> bool:
+    user = user_manager.get_user(session.get('username'))
+    return bool(user) and user['usertype'] == 2
+
+
+def profile_requests(bp: Blueprint):
+    """
+    Lets admins profile a single request handled by `bp` by adding
+    `?profile=1`. The request runs under cProfile with a span timeline
+    of upstream calls and template rendering; the result is kept in a
+    ring of the last MAX_PROFILES and its id returned in X-Profile-Id.
+    """
+    @bp.before_request
+    def start_profile():
+        if request.args.get('profile') != '1' or not _is_admin():
+            return
+        if not _profiler_lock.acquire(blocking=False):
+            return
+        g.profile_trace = tracing.start()
+        g.profiler = cProfile.Profile()
+        g.profiler.enable()
+
+    @bp.after_request
+    def stop_profile(response):
+        profiler = g.pop('profiler', None)
+        if profiler is None:
+            return response
+        try:
+            profiler.disable()
+            trace = tracing.stop()
+            duration = time.perf_counter() - trace.started
+            stats = io.StringIO()
+            pstats.Stats(profiler, stream=stats).sort_stats('cumulative').print_stats(PROFILE_STATS_LINES)
+        finally:
+            _profiler_lock.release()
+        profile = {
+            'id': uuid.uuid4().hex[:12],
+            'time': time.strftime('%Y-%m-%d %H:%M:%S'),
+            'method': request.method,
+            'path': request.full_path.rstrip('?'),
+            'status': response.status_code,
+            'user': session.get('username'),
+            'duration_ms': duration * 1000,
+            'spans': [
+                {'name': name, 'start_ms': start * 1000, 'duration_ms': elapsed * 1000, 'depth': depth}
+                for name, start, elapsed, depth in sorted(trace.spans, key=lambda s: s[1])
+            ],
+            'stats': stats.getvalue(),
+        }
+        with _profiles_lock:
+            _profiles.appendleft(profile)
+        response.headers['X-Profile-Id'] = profile['id']
+        return response
+
+    @bp.teardown_request
+    def abandon_profile(exc):
+        # after_request does not run when the view raised
+        profiler = g.pop('profiler', None)
+        if profiler is not None:
+            profiler.disable()
+            tracing.stop()
+            _profiler_lock.release()
+
+
+def _render_started(sender, template, context, **extra):
+    if tracing.active():
+        g.render_started = time.perf_counter()
+
+
+def _render_finished(sender, template, context, **extra):
+    started = g.pop('render_started', None)
+    if started is not None:
+        tracing.record(f'render {template.name}', started, time.perf_counter() - started)
+
+
+before_render_template.connect(_render_started)
+template_rendered.connect(_render_finished)
+
+
+@profiling_bp.route('/admin/profiles')
+@admin_required
+def list_profiles():
+    with _profiles_lock:
+        profiles = list(_profiles)
+    return render_template('auth/profiles.html', profiles=profiles)
+
+
+@profiling_bp.route('/admin/profiles/<profile_id>')
+@admin_required
+def view_profile(profile_id):
+    with _profiles_lock:
+        profile = next((p for p in _profiles if p['id'] == profile_id), None)
+    if profile is None:
+        abort(404)
+    return render_template('auth/profile.html', profile=profile)
@@ -0,0 +1,13 @@
+# Loaded automatically by `gunicorn app:app` from this directory.
+#
+# Every open room page holds an /api/events stream (SSE) for as long as
+# it stays open, so a worker must serve other requests alongside it:
+# the default single sync worker would stop responding to everything
+# else. gthread gives each worker a pool of threads; keep
+# EVENT_STREAM_LIMIT (per worker) well below GUNICORN_THREADS.
+import os
+
+bind = os.getenv('BIND', '0.0.0.0:8000')
+workers = int(os.getenv('WEB_CONCURRENCY', 2))
+worker_class = 'gthread'
+threads = int(os.getenv('GUNICORN_THREADS', 32))
@@ -1,25 +1,122 @@
+import fcntl
 import json
+import os
+import tempfile
+import threading
+from contextlib import contextmanager
+from typing import Optional
+
+from homebridge.action_plan import ActionPlan
 
 class ActionManager:
-    def __init__(self, actions_file='saved-actions.json'):
+    """
+    Saved actions, kept in memory and reloaded only when the file on
+    disk changes. Saves are serialized across threads and worker
+    processes with a lock file and written atomically (temp file + rename).
+
+    With a `client`, actions are validated at save time and compiled into
+    ActionPlans that runs can dispatch without re-fetching devices.
+    """
+    def __init__(self, actions_file='saved-actions.json', client=None):
         self.actions_file = actions_file
+        self.lock_file = actions_file + '.lock'
+        self.client = client
+        self._data = {}
+        self._plans = {}
+        self._stamp = None
+        self._lock = threading.Lock()
 
-    def list(self):
-        """Reads the JSON file and returns it as a dictionary."""
+    def _file_stamp(self):
+        try:
+            st = os.stat(self.actions_file)
+        except FileNotFoundError:
+            return None
+        return (st.st_mtime_ns, st.st_size, st.st_ino)
+
+    def _read(self) -> dict:
         try:
             with open(self.actions_file, 'r') as file:
                 return json.load(file)
         except FileNotFoundError:
             return {}
 
+    @contextmanager
+    def _file_lock(self):
+        with open(self.lock_file, 'a') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def list(self):
+        """Returns all actions as a dictionary, reloading if the file changed."""
+        stamp = self._file_stamp()
+        if stamp != self._stamp:
+            with self._lock:
+                stamp = self._file_stamp()
+                if stamp != self._stamp:
+                    self._data = self._read() if stamp else {}
+                    self._plans = {}
+                    self._stamp = stamp
+        return self._data
+
     def save(self, action_name: str, action: dict):
-        """Writes a new action to the JSON file."""
-        data = self.list()  # Load existing data
-        data[action_name] = action
-        with open(self.actions_file, 'w') as file:
-            json.dump(data, file, indent=2)
+        """
+        Writes a new action to the JSON file.
+
+        :raises ValueError: if the action fails validation against the
+                            current accessory metadata; nothing is written
+        :raises requests.RequestException: if the bridge can't be reached
+                                           to validate; nothing is written
+        """
+        plan = None
+        if self.client is not None:
+            plan = ActionPlan.compile(action_name, action, self.client)
+            if plan.errors:
+                raise ValueError(f'Invalid action {action_name}: {plan.errors}')
+
+        with self._file_lock():
+            # read from disk, not memory: another process may have saved since
+            data = self._read()
+            data[action_name] = action
+
+            directory = os.path.dirname(os.path.abspath(self.actions_file))
+            fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.saved-actions-', suffix='.tmp')
+            try:
+                # mkstemp creates 0600 files; keep the permissions of the file we replace
+                stat = os.stat(self.actions_file) if os.path.exists(self.actions_file) else None
+                os.chmod(tmp_path, stat.st_mode & 0o777 if stat else 0o644)
+                with os.fdopen(fd, 'w') as file:
+                    json.dump(data, file, indent=2)
+                    file.flush()
+                    os.fsync(file.fileno())
+                os.replace(tmp_path, self.actions_file)
+            except BaseException:
+                os.unlink(tmp_path)
+                raise
+
+            with self._lock:
+                self._data = data
+                self._plans = {action_name: plan} if plan else {}
+                self._stamp = self._file_stamp()
 
     def get(self, action_name: str) -> dict:
         """Returns a specific action from the JSON file."""
         data = self.list()
-        return data.get(action_name, None)
\ No newline at end of file
+        return data.get(action_name, None)
+
+
+    def get_plan(self, action_name: str) -> Optional[ActionPlan]:
+        """
+        Returns the compiled plan for an action, recompiling only if the
+        action changed on disk or a device's metadata changed.
+        """
+        action = self.get(action_name)
+        if action is None:
+            return None
+        plan = self._plans.get(action_name)
+        if plan is None or not plan.is_current(self.client):
+            plan = ActionPlan.compile(action_name, action, self.client)
+            self._plans[action_name] = plan
+        return plan
@@ -0,0 +1,85 @@
+from typing import Any, Dict, List, Optional
+
+import requests
+
+from homebridge.models import Device
+
+
+def metadata_signature(device_json: Dict[str, Any]) -> tuple:
+    """
+    The parts of an accessory that action validation depends on. Values
+    are left out, so the signature only changes when the metadata does.
+    """
+    return tuple(
+        (c['type'], c['canWrite'], c.get('minValue'), c.get('maxValue'), c.get('minStep'))
+        for c in device_json['serviceCharacteristics']
+    )
+
+
+class DevicePlan:
+    __slots__ = ('uniqueId', 'serviceName', 'changes', 'signature', 'error')
+
+    def __init__(self, uniqueId: str, changes: List[Dict[str, Any]], signature: Optional[tuple] = None,
+                 serviceName: Optional[str] = None, error: Optional[str] = None):
+        self.uniqueId = uniqueId
+        self.serviceName = serviceName
+        self.changes = changes
+        self.signature = signature
+        self.error = error
+
+    @classmethod
+    def compile(cls, unique_id: str, characteristics: Dict[str, Any], client) -> 'DevicePlan':
+        """
+        Validates `characteristics` against the device's metadata. Unknown
+        devices and invalid values become the plan's `error`.
+
+        :raises requests.RequestException: if the bridge can't be reached
+        """
+        try:
+            device_json = client.get_accessory_json(unique_id)
+        except requests.HTTPError as e:
+            if e.response is None or e.response.status_code != 404:
+                raise
+            return cls(unique_id, [], error=f'Device {unique_id} not found.')
+        device = Device.from_dict(device_json)
+        try:
+            for char_type, value in characteristics.items():
+                device.set_characteristic(char_type, value)
+        except ValueError as e:
+            return cls(unique_id, [], error=str(e))
+        return cls(
+            unique_id, list(device.get_changed_characteristics()),
+            metadata_signature(device_json), device.serviceName
+        )
+
+
+class ActionPlan:
+    """
+    An action compiled into validated writes, one DevicePlan per device.
+    Validation runs once against accessory metadata; the plan stays
+    valid until a device's metadata signature changes.
+    """
+    def __init__(self, name: str, devices: List[DevicePlan]):
+        self.name = name
+        self.devices = devices
+
+    @classmethod
+    def compile(cls, name: str, action: Dict[str, Dict[str, Any]], client) -> 'ActionPlan':
+        return cls(name, [DevicePlan.compile(i, c, client) for i, c in action.items()])
+
+    @property
+    def errors(self) -> Dict[str, str]:
+        return {d.uniqueId: d.error for d in self.devices if d.error}
+
+    def is_current(self, client) -> bool:
+        """True if no device's metadata changed since the plan was compiled."""
+        for d in self.devices:
+            if d.error:
+                # devices that failed validation (e.g. offline) get another try
+                return False
+            try:
+                if metadata_signature(client.get_accessory_json(d.uniqueId)) != d.signature:
+                    return False
+            except Exception:
+                return False
+        return True
@@ -0,0 +1,180 @@
+"""
+asyncio client for scripts and services that fan out over many devices.
+The Flask app uses the threaded client in homebridge.client; this module
+needs aiohttp, which is not in requirements.txt.
+"""
+import asyncio
+from typing import Any, Dict, List, Optional
+
+import aiohttp
+
+from homebridge.client import HomeBridgeClient, HomeBridgeCredential, TOKEN_EXPIRY_SKEW
+from homebridge.models import Device, Room
+
+
+class AsyncHomeBridgeAPI:
+    """
+    asyncio counterpart of HomeBridgeAPI: one aiohttp connection pool,
+    per-call timeouts and a cap on concurrent requests to the bridge.
+    """
+    def __init__(self, host: str, user: str, password: str, pool_size: int = 20,
+                 max_concurrency: int = 10, connect_timeout: float = 3.05, timeout: float = 10):
+        self.host: str = host
+        self.user: str = user
+        self.password: str = password
+        self.credential: Optional[HomeBridgeCredential] = None
+
+        self.pool_size = pool_size
+        self.timeout = aiohttp.ClientTimeout(total=timeout, sock_connect=connect_timeout)
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._token_lock = asyncio.Lock()
+        self._session: Optional[aiohttp.ClientSession] = None
+
+    @property
+    def session(self) -> aiohttp.ClientSession:
+        # created lazily so it binds to the loop that actually uses it
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.pool_size),
+                timeout=self.timeout
+            )
+        return self._session
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+
+    async def get_token(self, rejected: Optional[str] = None) -> str:
+        """
+        Single-flight token refresh, ahead of expiry.
+
+        :param rejected: a token the bridge refused; forces a new login
+                         unless another task already replaced it
+        """
+        credential = self.credential
+        if credential and credential.access_token != rejected and not credential.needs_refresh(TOKEN_EXPIRY_SKEW):
+            return credential.access_token
+        async with self._token_lock:
+            credential = self.credential
+            if (not credential or credential.access_token == rejected
+                    or credential.needs_refresh(TOKEN_EXPIRY_SKEW)):
+                await self._get_credential()
+        return self.credential.access_token
+
+    async def _get_credential(self):
+        payload = {
+            'username': self.user,
+            'password': self.password,
+            'otp': ''
+        }
+        async with self.session.post(f'{self.host}/api/auth/login', json=payload) as ans:
+            ans.raise_for_status()
+            if ans.status == 201:
+                self.credential = HomeBridgeCredential(await ans.json())
+
+    async def _request(self, method: str, uri: str, headers: Optional[Dict[str, str]] = None, **kwargs) -> Any:
+        headers = dict(headers or {})
+        token = await self.get_token()
+        async with self._semaphore:
+            for attempt in range(2):
+                headers['Authorization'] = f'Bearer {token}'
+                async with self.session.request(method, f'{self.host}{uri}', headers=headers, **kwargs) as response:
+                    if response.status == 401 and attempt == 0:
+                        # token revoked or expired mid-flight; retry once
+                        token = await self.get_token(rejected=token)
+                        continue
+                    response.raise_for_status()
+                    return await response.json()
+
+    async def get(self, uri: str, headers: Optional[Dict[str, str]] = None) -> Any:
+        return await self._request('GET', uri, headers)
+
+    async def post(self, uri: str, data: Optional[Dict[str, Any]] = None, headers: Optional[Dict[str, str]] = None) -> Any:
+        return await self._request('POST', uri, headers, json=data)
+
+    async def put(self, uri: str, data: Optional[Dict[str, Any]] = None, headers: Optional[Dict[str, str]] = None) -> Any:
+        return await self._request('PUT', uri, headers, json=data)
+
+    async def patch(self, uri: str, data: Optional[Dict[str, Any]] = None, headers: Optional[Dict[str, str]] = None) -> Any:
+        return await self._request('PATCH', uri, headers, json=data)
+
+    async def delete(self, uri: str, headers: Optional[Dict[str, str]] = None) -> Any:
+        return await self._request('DELETE', uri, headers)
+
+
+class AsyncHomeBridgeClient:
+    """
+    asyncio counterpart of HomeBridgeClient. Fan-out work (room loads,
+    action runs) can be gathered on one loop and cancelled as a unit.
+    """
+    def __init__(self, host, user, password, **api_options):
+        self.api = AsyncHomeBridgeAPI(host, user, password, **api_options)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    async def close(self):
+        await self.api.close()
+
+    async def get_pairings(self):
+        return await self.api.get('/api/server/pairings')
+
+    async def get_accessories(self) -> List[Device]:
+        response = await self.api.get('/api/accessories')
+        return [Device.from_dict(device_json) for device_json in response]
+
+    async def get_accessory(self, uniqueId: str) -> Device:
+        return Device.from_dict(await self.api.get(f'/api/accessories/{uniqueId}'))
+
+    async def get_accessories_layout(self) -> List[Room]:
+        response = await self.api.get('/api/accessories/layout')
+        return [Room.from_dict(room_json) for room_json in response]
+
+    async def update_accessory_characteristic(self, device: Device) -> Optional[Device]:
+        """
+        Writes every changed characteristic of `device`, confirming the
+        new values from the accessory state each PUT answers with.
+
+        :returns: the new device state, or None if a value did not stick
+                  (the device might be offline)
+        """
+        changes = device.get_changed_characteristics()
+        uri = f'/api/accessories/{device.uniqueId}'
+        responses = await asyncio.gather(*(self.api.put(uri, c) for c in changes))
+
+        states = [r for r in responses if isinstance(r, dict) and 'values' in r]
+        if not states:
+            # nothing echoed back; fall back to asking the bridge
+            states.append(await self.api.get(uri))
+
+        expected = {c['characteristicType']: c['value'] for c in changes}
+        if any(not any(s['values'].get(t, v) == v for s in states) for t, v in expected.items()):
+            # device might be offline
+            return None
+        return Device.from_dict(HomeBridgeClient._with_values(states[-1], expected))
+
+    async def update_accessories(self, updates: Dict[str, Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Applies `{uniqueId: {characteristicType: value}}` to every device
+        concurrently, validating against one bulk accessory fetch. Returns
+        each device's new state, None if it looks offline, or the
+        exception raised for it.
+        """
+        index = {a['uniqueId']: a for a in await self.api.get('/api/accessories')}
+
+        async def update(unique_id: str, characteristics: Dict[str, Any]):
+            device_json = index.get(unique_id)
+            if device_json is None:
+                device_json = await self.api.get(f'/api/accessories/{unique_id}')
+            device = Device.from_dict(device_json)
+            for char_type, value in characteristics.items():
+                device.set_characteristic(char_type, value)
+            return await self.update_accessory_characteristic(device)
+
+        results = await asyncio.gather(
+            *(update(i, c) for i, c in updates.items()), return_exceptions=True
+        )
+        return dict(zip(updates, results))
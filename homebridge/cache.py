@@ -0,0 +1,213 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from homebridge.encoding import dumps
+from homebridge import metrics
+
+
+class CacheEntry:
+    __slots__ = ('value', 'fetched_at')
+
+    def __init__(self, value: Any, fetched_at: float):
+        self.value = value
+        self.fetched_at = fetched_at
+
+    def age(self) -> float:
+        return time.monotonic() - self.fetched_at
+
+
+class ResponseCache:
+    """
+    Bounded LRU cache of upstream responses with stale-while-revalidate.
+
+    - entries younger than their TTL are served as-is
+    - entries older than their TTL but within `stale_ttl` are served
+      immediately while a single refresh runs on the worker pool
+    - anything older (or missing) is fetched synchronously
+
+    Only one fetch per key runs at a time; concurrent callers for the
+    same key wait on the in-flight fetch instead of starting their own.
+    """
+    def __init__(self, max_entries: int = 512, default_ttl: float = 5,
+                 ttls: Optional[Dict[str, float]] = None, stale_ttl: float = 60,
+                 refresh_workers: int = 4):
+        self.max_entries = max_entries
+        self.default_ttl = default_ttl
+        self.ttls: Dict[str, float] = ttls or {}
+        self.stale_ttl = stale_ttl
+
+        self._entries: 'OrderedDict[str, CacheEntry]' = OrderedDict()
+        self._inflight: Dict[str, Future] = {}
+        self._generation: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._refresher = ThreadPoolExecutor(
+            max_workers=refresh_workers, thread_name_prefix='hb-cache-refresh'
+        )
+
+    def ttl_for(self, key: str) -> float:
+        return self.ttls.get(key, self.default_ttl)
+
+    def get(self, key: str, loader: Callable[[], Any], fresh: bool = False,
+            allow_stale: bool = True) -> Any:
+        """
+        Returns the cached value for `key`, calling `loader` when needed.
+
+        :param fresh: skip the cache and always wait for a new upstream value
+        :param allow_stale: serve entries past their TTL while refreshing;
+                            if False, wait for the refresh instead
+        """
+        if not fresh:
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry is not None:
+                    self._entries.move_to_end(key)
+                    age = entry.age()
+                    ttl = self.ttl_for(key)
+                    if age < ttl:
+                        metrics.cache_requests.inc('hit')
+                        return entry.value
+                    if allow_stale and age < ttl + self.stale_ttl:
+                        metrics.cache_requests.inc('stale')
+                        self._schedule_refresh(key, loader)
+                        return entry.value
+        metrics.cache_requests.inc('miss')
+        return self._load(key, loader, join=not fresh)
+
+    def set(self, key: str, value: Any):
+        with self._lock:
+            self._store(key, value)
+
+    def update(self, key: str, change: Callable[[Any], Any]) -> bool:
+        """
+        Replaces a cached value with `change(value)`, keeping its age, so
+        a write can be folded into a collection without refetching it.
+        Fetches of `key` already running may predate the write, so their
+        result won't be cached.
+
+        :returns: False if `key` was not cached
+        """
+        with self._lock:
+            if key in self._inflight:
+                self._generation[key] = self._generation.get(key, 0) + 1
+            entry = self._entries.get(key)
+            if entry is None:
+                return False
+            entry.value = change(entry.value)
+            return True
+
+    def invalidate(self, key: Optional[str] = None):
+        """Drops one key (or everything) so the next read goes upstream."""
+        with self._lock:
+            keys = [key] if key is not None else list(self._entries) + list(self._inflight)
+            for k in keys:
+                self._entries.pop(k, None)
+                # fetches already running may predate the write; let the
+                # next reader start its own instead of joining them
+                self._inflight.pop(k, None)
+                self._generation[k] = self._generation.get(k, 0) + 1
+
+    def _load(self, key: str, loader: Callable[[], Any], join: bool = True) -> Any:
+        with self._lock:
+            future = self._inflight.get(key) if join else None
+            if future is None:
+                future, generation = self._begin(key)
+                leader = True
+            else:
+                leader = False
+
+        if not leader:
+            return future.result()
+        return self._run(key, loader, future, generation)
+
+    def _schedule_refresh(self, key: str, loader: Callable[[], Any]):
+        # caller holds self._lock
+        if key in self._inflight:
+            return
+        future, generation = self._begin(key)
+        metrics.cache_refreshes.inc()
+
+        def refresh():
+            try:
+                self._run(key, loader, future, generation)
+            except Exception:
+                # stale value stays in place; next read past stale_ttl retries
+                pass
+
+        self._refresher.submit(refresh)
+
+    def _begin(self, key: str):
+        # caller holds self._lock
+        future = Future()
+        self._inflight[key] = future
+        return future, self._generation.get(key, 0)
+
+    def _run(self, key: str, loader: Callable[[], Any], future: Future, generation: int) -> Any:
+        try:
+            value = loader()
+        except BaseException as e:
+            with self._lock:
+                if self._inflight.get(key) is future:
+                    del self._inflight[key]
+            future.set_exception(e)
+            raise
+
+        with self._lock:
+            # a write invalidated this key while we were fetching; the
+            # value may predate it, so hand it back but don't cache it
+            if self._generation.get(key, 0) == generation:
+                self._store(key, value)
+            if self._inflight.get(key) is future:
+                del self._inflight[key]
+        future.set_result(value)
+        return value
+
+    def _store(self, key: str, value: Any):
+        # caller holds self._lock
+        self._entries[key] = CacheEntry(value, time.monotonic())
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+
+class SerializedCache:
+    """
+    Bounded LRU of encoded JSON bodies and their strong ETags.
+
+    Each entry remembers the source object(s) it was built from; raw
+    accessory json is replaced, never mutated, when state changes, so an
+    identical source means the encoded body is still current.
+    """
+    def __init__(self, max_entries: int = 1024):
+        self.max_entries = max_entries
+        self._entries: 'OrderedDict[Any, Tuple[Any, bytes, str]]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _same(a: Any, b: Any) -> bool:
+        if isinstance(a, tuple) and isinstance(b, tuple):
+            return len(a) == len(b) and all(x is y for x, y in zip(a, b))
+        return a is b
+
+    def get(self, key: Any, source: Any, build: Callable[[], Any]) -> Tuple[bytes, str]:
+        """
+        Returns `(body, etag)` for `key`, calling `build` for a fresh
+        payload only when `source` differs from the cached entry's.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self._same(entry[0], source):
+                self._entries.move_to_end(key)
+                return entry[1], entry[2]
+
+        body = dumps(build())
+        etag = hashlib.blake2b(body, digest_size=16).hexdigest()
+        with self._lock:
+            self._entries[key] = (source, body, etag)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return body, etag
@@ -1,150 +1,460 @@
-import requests,time, json
-from typing import Dict, Optional, Any, List
+import requests,time, json, threading, re
+import logging
+from requests.adapters import HTTPAdapter
+from concurrent.futures import ThreadPoolExecutor
+from urllib3.util.retry import Retry
+from typing import Dict, Optional, Any, List, Tuple
 from homebridge.models import Device, Room
-from datetime import datetime, timedelta
-import threading
+from homebridge.cache import ResponseCache
+from homebridge.live import AccessoryStateStore, AccessoryEventStream
+from homebridge.health import DeviceHealth
+from homebridge import metrics, tracing
+
+logger = logging.getLogger(__name__)
 
 
 class HomeBridgeCredential:
     def __init__(self,creds):
         self.access_token = creds['access_token']
         self.token_type = creds['token_type']
-        self.expires = creds['expires_in'] + time.time()
+        self.issued = time.time()
+        self.expires = creds['expires_in'] + self.issued
 
-    def is_expired(self):
-        if time.time() > self.expires:
+    def is_expired(self, skew: float = 0):
+        """
+        :param skew: seconds of clock skew / request time to allow for,
+                     so a token isn't sent just as the bridge rejects it
+        """
+        if time.time() > self.expires - skew:
             return True
         return False
 
+    def needs_refresh(self, skew: float = 0) -> bool:
+        """True once 80% of the token's lifetime has passed."""
+        refresh_at = self.issued + (self.expires - self.issued) * 0.8
+        return time.time() > min(refresh_at, self.expires - skew)
+
+# seconds a GET response is considered fresh, per URI.
+# the room layout rarely changes; accessory values change constantly
+CACHE_TTLS = {
+    '/api/accessories/layout': 300,
+    '/api/server/pairings': 300,
+    '/api/accessories': 2,
+}
+DEFAULT_CACHE_TTL = 2
+
+# seconds before expiry a token is treated as expired
+TOKEN_EXPIRY_SKEW = 30
+
+_ACCESSORY_ID = re.compile(r'^/api/accessories/(?!layout$)[^/]+')
+
+def uri_template(uri: str) -> str:
+    """Collapses ids out of a URI so metrics group by endpoint."""
+    return _ACCESSORY_ID.sub('/api/accessories/{uniqueId}', uri.split('?', 1)[0])
+
+
 class HomeBridgeAPI:
     """
     Generalized API interface to simplify credential management
     """
-    def __init__(self, host: str, user: str, password: str, cache_expiration: int = 300):
+    def __init__(self, host: str, user: str, password: str, cache_expiration: int = 300,
+                 pool_size: int = 20, timeout: Tuple[float, float] = (3.05, 10),
+                 retries: int = 2, cache_size: int = 512, cache_ttls: Optional[Dict[str, float]] = None,
+                 refresh_workers: int = 4):
         self.host: str = host
         self.user: str = user
         self.password: str = password
         self.credential: Optional[HomeBridgeCredential] = None
+        self._credential_lock = threading.Lock()
 
-        # In-memory cache: stores (response, timestamp) pairs
-        self.cache: Dict[str, (Dict[str, Any], datetime)] = {}
-        self.cache_expiration = timedelta(seconds=cache_expiration)
+        # In-memory response cache; stale entries (up to cache_expiration
+        # past their TTL) are served while a background refresh runs
+        self.cache = ResponseCache(
+            max_entries=cache_size,
+            default_ttl=DEFAULT_CACHE_TTL,
+            ttls={**CACHE_TTLS, **(cache_ttls or {})},
+            stale_ttl=cache_expiration,
+            refresh_workers=refresh_workers
+        )
 
-    def get_token(self) -> str:
-        if not self.credential or self.credential.is_expired():
-            self._get_credential()
+        # (connect, read) timeout applied to every upstream call
+        self.timeout = timeout
+        self.session = self._build_session(pool_size, retries)
 
-        return self.credential.access_token
+    @staticmethod
+    def _build_session(pool_size: int, retries: int) -> requests.Session:
+        """
+        Builds a keep-alive session backed by a connection pool so upstream
+        calls reuse sockets instead of opening a new connection each time.
+        urllib3 pools are thread-safe, so one session is shared by all threads.
+        """
+        retry = Retry(
+            total=retries,
+            connect=retries,
+            read=retries,
+            backoff_factor=0.2,
+            status_forcelist=(502, 503, 504),
+            raise_on_status=False
+        )
+        adapter = HTTPAdapter(
+            pool_connections=pool_size,
+            pool_maxsize=pool_size,
+            max_retries=retry,
+            pool_block=True
+        )
+        session = requests.Session()
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        return session
+
+    def _request(self, method: str, uri: str, headers: Optional[Dict[str, str]] = None, **kwargs) -> requests.Response:
+        """
+        Sends an authenticated request over the pooled session. A 401
+        (token revoked or expired mid-flight) is retried once with a new token.
+        """
+        headers = headers or {}
+        token = self.get_token()
+        headers['Authorization'] = f'Bearer {token}'
+        response = self._send(method, uri, headers=headers, **kwargs)
+        if response.status_code == 401:
+            headers['Authorization'] = f'Bearer {self.get_token(rejected=token)}'
+            response = self._send(method, uri, headers=headers, **kwargs)
+        response.raise_for_status()
+        return response
+
+    def _send(self, method: str, uri: str, **kwargs) -> requests.Response:
+        """One timed request over the pooled session."""
+        template = uri_template(uri)
+        started = time.perf_counter()
+        try:
+            with tracing.span(f'{method} {uri}'):
+                response = self.session.request(method, f'{self.host}{uri}', timeout=self.timeout, **kwargs)
+        except requests.RequestException:
+            metrics.upstream_errors.inc(method, template, 'exception')
+            raise
+        finally:
+            metrics.upstream_latency.observe(time.perf_counter() - started, method, template)
+        if response.status_code >= 400:
+            metrics.upstream_errors.inc(method, template, str(response.status_code))
+        return response
+
+    def get_token(self, rejected: Optional[str] = None) -> str:
+        """
+        Returns a valid access token. Only one thread logs in at a time;
+        the rest wait for (and reuse) its result. Tokens are refreshed
+        ahead of expiry by whichever caller notices first, while other
+        callers keep using the current one.
+
+        :param rejected: a token the bridge refused; forces a new login
+                         unless another thread already replaced it
+        """
+        credential = self.credential
+        if credential and credential.access_token != rejected:
+            if not credential.needs_refresh(TOKEN_EXPIRY_SKEW):
+                return credential.access_token
+            if not credential.is_expired(TOKEN_EXPIRY_SKEW):
+                # still usable: refresh only if nobody else is already
+                if self._credential_lock.acquire(blocking=False):
+                    try:
+                        if self.credential is credential:
+                            self._get_credential()
+                    except requests.RequestException:
+                        # current token is still good; the next caller retries
+                        pass
+                    finally:
+                        self._credential_lock.release()
+                return self.credential.access_token
+
+        with self._credential_lock:
+            credential = self.credential
+            if (not credential or credential.access_token == rejected
+                    or credential.is_expired(TOKEN_EXPIRY_SKEW)):
+                self._get_credential()
+            return self.credential.access_token
 
     def _get_credential(self):
-        url = f'{self.host}/api/auth/login'
         payload = {
             'username': self.user,
             'password': self.password,
             'otp': ''
         }
-        ans = requests.post(url, json=payload)
+        metrics.token_refreshes.inc()
+        ans = self._send('POST', '/api/auth/login', json=payload)
         ans.raise_for_status()
         if ans.status_code == 201:
             self.credential = HomeBridgeCredential(ans.json())
 
-    def get(self, uri: str, headers: Optional[Dict[str, str]] = None, fresh=True) -> Dict[str, Any]:
-        cache_key = uri  # Using the URI as the cache key
-        now = datetime.now()
+    def get(self, uri: str, headers: Optional[Dict[str, str]] = None, fresh=False,
+            allow_stale=True) -> Dict[str, Any]:
+        """
+        GETs `uri`, served from the response cache when possible.
 
-        # Check if the data is cached and still valid
-        if cache_key in self.cache and not fresh:
-            cached_data, timestamp = self.cache[cache_key]
-            if now - timestamp < self.cache_expiration:
-                # Serve the cached data immediately
-                self._update_cache_in_background(uri, headers)  # Refresh cache in the background
-                return cached_data
+        :param fresh: bypass the cache and wait for the bridge's current value
+        :param allow_stale: serve a value past its TTL while it refreshes
+        """
+        return self.cache.get(uri, lambda: self._fetch(uri, headers), fresh=fresh, allow_stale=allow_stale)
 
-        # If not cached or expired, fetch from the API and update the cache
-        response_data = self._fetch_and_cache(uri, headers)
-        return response_data
-
-    def _fetch_and_cache(self, uri: str, headers: Optional[Dict[str, str]] = None) -> Dict[str, Any]:
-        """Fetch the data from the API and store it in the cache."""
-        headers = headers or {}
-        headers['Authorization'] = f'Bearer {self.get_token()}'
-        response = requests.get(f'{self.host}{uri}', headers=headers)
-        response.raise_for_status()
-        response_data = response.json()
-
-        # Update the cache with the new data and the current timestamp
-        self.cache[uri] = (response_data, datetime.now())
-        return response_data
-
-    def _update_cache_in_background(self, uri: str, headers: Optional[Dict[str, str]] = None):
-        """Start a thread to update the cache in the background."""
-        thread = threading.Thread(target=self._fetch_and_cache, args=(uri, headers))
-        thread.daemon = True  # Daemon thread will not block program exit
-        thread.start()
+    def _fetch(self, uri: str, headers: Optional[Dict[str, str]] = None) -> Dict[str, Any]:
+        """Fetch the data from the API."""
+        return self._request('GET', uri, dict(headers or {})).json()
 
     def post(self, uri: str, data: Optional[Dict[str, Any]] = None, headers: Optional[Dict[str, str]] = None) -> Dict[str, Any]:
-        headers = headers or {}
-        headers['Authorization'] = f'Bearer {self.get_token()}'
-        response = requests.post(f'{self.host}{uri}', json=data, headers=headers)
-        response.raise_for_status()
-        return response.json()
+        return self._request('POST', uri, headers, json=data).json()
 
-    def put(self, uri: str, data: Optional[Dict[str, Any]] = None, headers: Optional[Dict[str, str]] = None) -> Dict[str, Any]:
-        headers = headers or {}
-        headers['Authorization'] = f'Bearer {self.get_token()}'
-        response = requests.put(f'{self.host}{uri}', json=data, headers=headers)
-        response.raise_for_status()
-        return response.json()
+    def put(self, uri: str, data: Optional[Dict[str, Any]] = None, headers: Optional[Dict[str, str]] = None,
+            invalidate_parent: bool = True) -> Dict[str, Any]:
+        """
+        :param invalidate_parent: also drop the cached collection `uri`
+                                  belongs to; pass False when the caller
+                                  folds the result into it instead
+        """
+        try:
+            return self._request('PUT', uri, headers, json=data).json()
+        finally:
+            self._invalidate(uri, invalidate_parent)
 
     def patch(self, uri: str, data: Optional[Dict[str, Any]] = None, headers: Optional[Dict[str, str]] = None) -> Dict[str, Any]:
-        headers = headers or {}
-        headers['Authorization'] = f'Bearer {self.get_token()}'
-        response = requests.patch(f'{self.host}{uri}', json=data, headers=headers)
-        response.raise_for_status()
-        return response.json()
+        try:
+            return self._request('PATCH', uri, headers, json=data).json()
+        finally:
+            self._invalidate(uri)
 
     def delete(self, uri: str, headers: Optional[Dict[str, str]] = None) -> Dict[str, Any]:
-        headers = headers or {}
-        headers['Authorization'] = f'Bearer {self.get_token()}'
-        response = requests.delete(f'{self.host}{uri}', headers=headers)
-        response.raise_for_status()
-        return response.json()
+        try:
+            return self._request('DELETE', uri, headers).json()
+        finally:
+            self._invalidate(uri)
+
+    def _invalidate(self, uri: str, parent: bool = True):
+        """Drops cached reads of `uri` and the collection it belongs to."""
+        self.cache.invalidate(uri)
+        collection = uri.rsplit('/', 1)[0]
+        if parent and collection.startswith('/api/'):
+            self.cache.invalidate(collection)
 
 
 class HomeBridgeClient:
-    def __init__(self,host, user,password):
-        self.api = HomeBridgeAPI(host,user,password)
+    def __init__(self,host, user,password, write_workers: int = 8, **api_options):
+        self.api = HomeBridgeAPI(host,user,password, **api_options)
+
+        # sends a device's characteristic PUTs side by side
+        self._writer = ThreadPoolExecutor(max_workers=write_workers, thread_name_prefix='hb-write')
+
+        # uniqueId -> raw accessory json, rebuilt whenever the cached
+        # /api/accessories response is replaced
+        self._accessory_index: Dict[str, Dict[str, Any]] = {}
+        self._accessory_index_source = None
+        self._accessory_index_lock = threading.Lock()
+
+        # per-device circuit breakers so offline devices fail fast
+        self.health = DeviceHealth()
+
+        # pushed accessory state; preferred over REST whenever it is synced
+        self.state = AccessoryStateStore()
+        self._event_stream = AccessoryEventStream(self.api, self.state)
+
+    def start_live_updates(self):
+        """Subscribes to the Homebridge UI event stream (idempotent)."""
+        self._event_stream.start()
+
+    def stop_live_updates(self):
+        self._event_stream.stop()
 
     def get_pairings(self):
         return self.api.get('/api/server/pairings')
     
     def get_accessories(self) -> List[Device]:
-        response = self.api.get('/api/accessories')
-        return [Device.from_dict(device_json) for device_json in response]
-    
-    def get_accessory(self,uniqueId:str):
-        return Device.from_dict(self.api.get(f'/api/accessories/{uniqueId}'))
+        return [Device.from_dict(device_json) for device_json in self._get_accessory_index().values()]
+
+    def get_current_state(self) -> Dict[str, Dict[str, Any]]:
+        """
+        All accessories keyed by uniqueId, never older than the accessory
+        cache TTL: the live state store if synced, otherwise the bulk
+        accessory list without stale-while-revalidate.
+        """
+        return self._get_accessory_index(allow_stale=False)
+
+    def _get_accessory_index(self, allow_stale: bool = True) -> Dict[str, Dict[str, Any]]:
+        """
+        Returns all accessories keyed by uniqueId. Served from the live
+        state store when it is synced, otherwise built from one bulk
+        /api/accessories fetch and reused until that response is refreshed.
+        """
+        if self.state.synced:
+            return self.state.snapshot()
+        response = self.api.get('/api/accessories', allow_stale=allow_stale)
+        with self._accessory_index_lock:
+            if response is not self._accessory_index_source:
+                self._accessory_index = {a['uniqueId']: a for a in response}
+                self._accessory_index_source = response
+            return self._accessory_index
+
+    def get_accessory(self,uniqueId:str, fresh: bool = False) -> Device:
+        """
+        Returns one accessory, looked up in the bulk accessory index.
+
+        :param fresh: skip the index and ask the bridge for its current state
+        """
+        with tracing.span(f'get_accessory {uniqueId[:8]}'):
+            accessory = self.get_accessory_json(uniqueId, fresh)
+            with tracing.span('Device.from_dict'):
+                return Device.from_dict(accessory)
+
+    def get_accessory_json(self, uniqueId: str, fresh: bool = False) -> Dict[str, Any]:
+        """
+        Raw accessory json as served by the bridge. A new object is
+        returned whenever the accessory's state changes, so the object
+        itself can be used as a version.
+        """
+        if not fresh:
+            device_json = self._get_accessory_index().get(uniqueId)
+            if device_json is not None:
+                return device_json
+        return self.api.get(f'/api/accessories/{uniqueId}', fresh=fresh)
     
-    def update_accessory_characteristic(self,device: Device)-> Device:
-        for c in device.get_changed_characteristics():
-            self.api.put(f'/api/accessories/{device.uniqueId}',c)
-        newState = self.get_accessory(device.uniqueId)
-
-        for c in device.get_changed_characteristics():
-            for cc in newState.get_characteristics():
-                if cc['type'] == c['characteristicType']:
-                    if cc['value'] != c['value']:
-                        print(f"{cc['value']} != {c['value']}")
-                        # device might be offline
-                        return None
+    def get_accessories_json(self, uniqueIds: List[str]) -> List[Dict[str, Any]]:
+        """
+        Raw json for several accessories, in the order given, all taken
+        from the same accessory index snapshot. Unknown ids are left out.
+        """
+        index = self._get_accessory_index()
+        return [index[uniqueId] for uniqueId in uniqueIds if uniqueId in index]
+
+    def update_accessory_characteristic(self,device: Device, confirm_timeout: float = 0)-> Optional[Device]:
+        """
+        Writes every changed characteristic of `device`.
+        See write_characteristics.
+        """
+        return self.write_characteristics(device.uniqueId, device.get_changed_characteristics(), confirm_timeout)
 
+    def write_characteristics(self, uniqueId: str, changes: List[Dict[str, Any]],
+                              confirm_timeout: float = 0) -> Optional[Device]:
+        """
+        Writes already-validated `{characteristicType, value}` changes and
+        confirms the new values without re-downloading the accessory.
+
+        A device's PUTs are sent concurrently and each answers with the
+        accessory's refreshed state, which serves as confirmation. Values
+        not confirmed there are checked against the live state store,
+        waiting up to `confirm_timeout` seconds for a pushed update.
+
+        :returns: the new device state, or None if a value did not stick
+                  (the device might be offline)
+        :raises DeviceUnavailableError: if the device has failed repeatedly
+                                        and its circuit is open
+        """
+        self.health.acquire(uniqueId)
+        try:
+            newState = self._write_characteristics(uniqueId, changes, confirm_timeout)
+        except Exception:
+            self.health.record_failure(uniqueId)
+            raise
+        if newState is None:
+            self.health.record_failure(uniqueId)
+        else:
+            self.health.record_success(uniqueId)
         return newState
-                        
 
+    def _write_characteristics(self, uniqueId: str, changes: List[Dict[str, Any]],
+                               confirm_timeout: float) -> Optional[Device]:
+        uri = f'/api/accessories/{uniqueId}'
+        if len(changes) > 1:
+            responses = list(self._writer.map(lambda c: self.api.put(uri, c, invalidate_parent=False), changes))
+        else:
+            responses = [self.api.put(uri, c, invalidate_parent=False) for c in changes]
+
+        states = [r for r in responses if isinstance(r, dict) and 'values' in r]
+        if self.state.synced and self.state.get(uniqueId):
+            states.append(self.state.get(uniqueId))
+        if not states:
+            # nothing echoed back or pushed; fall back to asking the bridge
+            states.append(self.api.get(uri, fresh=True))
+
+        expected = {c['characteristicType']: c['value'] for c in changes}
+        mismatched = {
+            t: v for t, v in expected.items()
+            if not any(s['values'].get(t, v) == v for s in states)
+        }
+        if mismatched and confirm_timeout and self.state.synced:
+            confirmed = self.state.wait_for(
+                uniqueId,
+                lambda s: all(s['values'].get(t) == v for t, v in mismatched.items()),
+                confirm_timeout
+            )
+            if confirmed:
+                states.append(confirmed)
+                mismatched = {}
+
+        if mismatched:
+            # device might be offline
+            logger.warning(
+                'write to %s not confirmed: %s', uniqueId,
+                {t: ([s['values'].get(t) for s in states], v) for t, v in mismatched.items()}
+            )
+            return None
+
+        newState = self._with_values(states[-1], expected)
+        self._store_accessory(newState)
+        return Device.from_dict(newState)
+
+    def _store_accessory(self, accessory: Dict[str, Any]):
+        """
+        Swaps confirmed accessory json into the cached accessory list and
+        its index, so a write doesn't make the next read download every
+        accessory again.
+        """
+        uniqueId = accessory['uniqueId']
+        self.api.cache.set(f'/api/accessories/{uniqueId}', accessory)
+        with self._accessory_index_lock:
+            def swap(accessories):
+                replaced = [accessory if a['uniqueId'] == uniqueId else a for a in accessories]
+                if accessories is self._accessory_index_source:
+                    index = dict(self._accessory_index)
+                    index[uniqueId] = accessory
+                    self._accessory_index = index
+                    self._accessory_index_source = replaced
+                return replaced
+            self.api.cache.update('/api/accessories', swap)
+
+    @staticmethod
+    def _with_values(accessory: Dict[str, Any], values: Dict[str, Any]) -> Dict[str, Any]:
+        """Returns a copy of raw accessory json with `values` applied."""
+        accessory = dict(accessory)
+        accessory['values'] = {**accessory['values'], **values}
+        accessory['serviceCharacteristics'] = [
+            {**c, 'value': values[c['type']]} if c['type'] in values else c
+            for c in accessory['serviceCharacteristics']
+        ]
+        return accessory
 
-            
-        
-    
     def get_accessories_layout(self):
-        response = self.api.get('/api/accessories/layout')
-        return [Room.from_dict(room_json) for room_json in response]
\ No newline at end of file
+        with tracing.span('get_accessories_layout'):
+            return [Room.from_dict(room_json) for room_json in self.get_accessories_layout_json()]
+
+    def get_accessories_layout_json(self) -> List[Dict[str, Any]]:
+        return self.api.get('/api/accessories/layout')
+
+
+# one client per bridge per process, so every blueprint shares a token,
+# a response cache and a connection pool
+_shared_clients: Dict[Tuple[str, str], HomeBridgeClient] = {}
+_shared_clients_lock = threading.Lock()
+
+def get_shared_client(host, user, password, live_updates: bool = True, **api_options) -> HomeBridgeClient:
+    """
+    Returns the process-wide HomeBridgeClient for `host`/`user`,
+    creating it on first use. Safe to call from any thread.
+
+    :param live_updates: subscribe the new client to the bridge's event stream
+    """
+    key = (host, user)
+    client = _shared_clients.get(key)
+    if client is None:
+        with _shared_clients_lock:
+            client = _shared_clients.get(key)
+            if client is None:
+                client = HomeBridgeClient(host, user, password, **api_options)
+                if live_updates and host:
+                    client.start_live_updates()
+                _shared_clients[key] = client
+    return client
@@ -0,0 +1,51 @@
+import json
+from typing import Any, Dict, FrozenSet, Optional
+
+try:
+    import orjson
+except ImportError:  # optional: falls back to the stdlib encoder
+    orjson = None
+
+
+def dumps(obj: Any) -> bytes:
+    """Encodes `obj` as compact JSON bytes, using orjson when installed."""
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, separators=(',', ':')).encode()
+
+
+def parse_fields(fields: Optional[str]) -> Optional[Dict[str, dict]]:
+    """
+    Parses a `fields=` parameter into a projection tree. Nested fields
+    use dots, e.g. `uniqueId,serviceCharacteristics.type` becomes
+    `{'uniqueId': {}, 'serviceCharacteristics': {'type': {}}}`.
+    """
+    if not fields:
+        return None
+    tree: Dict[str, dict] = {}
+    for path in fields.split(','):
+        node = tree
+        for part in filter(None, path.strip().split('.')):
+            node = node.setdefault(part, {})
+    return tree or None
+
+
+def project(data: Any, tree: Optional[Dict[str, dict]]) -> Any:
+    """Keeps only the fields in `tree`; lists are projected element-wise."""
+    if not tree:
+        return data
+    if isinstance(data, list):
+        return [project(item, tree) for item in data]
+    if isinstance(data, dict):
+        return {k: project(data[k], sub) for k, sub in tree.items() if k in data}
+    return data
+
+
+def compact(data: Any, omit: FrozenSet[str] = frozenset()) -> Any:
+    """Drops nulls, empty lists/dicts and any key in `omit`, recursively."""
+    if isinstance(data, dict):
+        data = {k: compact(v, omit) for k, v in data.items() if k not in omit}
+        return {k: v for k, v in data.items() if v is not None and v != [] and v != {}}
+    if isinstance(data, list):
+        return [compact(item, omit) for item in data]
+    return data
@@ -0,0 +1,134 @@
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import Any, Dict, List, Optional
+
+from homebridge.client import HomeBridgeClient
+from homebridge.action_plan import ActionPlan, DevicePlan
+from homebridge.health import DeviceUnavailableError
+
+
+class DeviceResult:
+    SUCCESS = 'success'
+    # every characteristic already had its target value; nothing was written
+    SKIPPED = 'skipped'
+    OFFLINE = 'offline'
+    ERROR = 'error'
+    TIMEOUT = 'timeout'
+
+    def __init__(self, uniqueId: str, status: str, latency: float,
+                 serviceName: Optional[str] = None, error: Optional[str] = None,
+                 skipped: Optional[List[str]] = None):
+        self.uniqueId = uniqueId
+        self.status = status
+        self.latency = latency
+        self.serviceName = serviceName
+        self.error = error
+        self.skipped = skipped or []
+
+    def to_dict(self) -> dict:
+        return {
+            'uniqueId': self.uniqueId,
+            'serviceName': self.serviceName,
+            'status': self.status,
+            'latencyMs': round(self.latency * 1000, 1),
+            'error': self.error,
+            'skipped': self.skipped
+        }
+
+
+class ActionReport:
+    def __init__(self, action_name: str, results: List[DeviceResult], duration: float):
+        self.action_name = action_name
+        self.results = results
+        self.duration = duration
+
+    @property
+    def succeeded(self) -> List[DeviceResult]:
+        return [r for r in self.results if r.status in (DeviceResult.SUCCESS, DeviceResult.SKIPPED)]
+
+    @property
+    def ok(self) -> bool:
+        return len(self.succeeded) == len(self.results)
+
+    def to_dict(self) -> dict:
+        return {
+            'status': 'success' if self.ok else 'partial',
+            'msg': f'{self.action_name} applied changes to {len(self.succeeded)} of {len(self.results)} device(s)',
+            'durationMs': round(self.duration * 1000, 1),
+            'devices': [r.to_dict() for r in self.results]
+        }
+
+
+class ActionExecutor:
+    """
+    Runs compiled action plans on a shared, bounded worker pool. The pool
+    size is the cap on concurrent device updates against the bridge
+    across all running actions.
+    """
+    def __init__(self, client: HomeBridgeClient, max_workers: int = 8, action_timeout: float = 30):
+        self.client = client
+        self.action_timeout = action_timeout
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='hb-action')
+
+    def run(self, plan: ActionPlan, timeout: Optional[float] = None, diff: bool = True) -> ActionReport:
+        """
+        Dispatches every device's writes in `plan` and waits up to `timeout`
+        seconds (default: action_timeout) for all of them to finish.
+
+        :param diff: skip characteristics whose current value already
+                     matches the target, judged from the live or freshly
+                     cached accessory state
+        """
+        timeout = self.action_timeout if timeout is None else timeout
+        started = time.monotonic()
+        current = self._current_state() if diff else {}
+        futures = {
+            device_plan.uniqueId: self._pool.submit(
+                self._update_device, device_plan, current.get(device_plan.uniqueId)
+            )
+            for device_plan in plan.devices
+        }
+        wait(futures.values(), timeout=timeout)
+
+        results = []
+        for unique_id, future in futures.items():
+            if future.done():
+                results.append(future.result())
+            else:
+                future.cancel()
+                results.append(DeviceResult(
+                    unique_id, DeviceResult.TIMEOUT, time.monotonic() - started,
+                    error=f'not finished after {timeout}s'
+                ))
+        return ActionReport(plan.name, results, time.monotonic() - started)
+
+    def _current_state(self) -> Dict[str, Dict[str, Any]]:
+        try:
+            return self.client.get_current_state()
+        except Exception:
+            # without a trustworthy state, write everything
+            return {}
+
+    def _update_device(self, device_plan: DevicePlan, current: Optional[Dict[str, Any]] = None) -> DeviceResult:
+        started = time.monotonic()
+        unique_id, name = device_plan.uniqueId, device_plan.serviceName
+        if device_plan.error:
+            return DeviceResult(unique_id, DeviceResult.ERROR, 0, name, device_plan.error)
+
+        changes, skipped = device_plan.changes, []
+        if current is not None:
+            values = current['values']
+            skipped = [c['characteristicType'] for c in changes
+                       if c['characteristicType'] in values and values[c['characteristicType']] == c['value']]
+            changes = [c for c in changes if c['characteristicType'] not in skipped]
+        if not changes:
+            return DeviceResult(unique_id, DeviceResult.SKIPPED, time.monotonic() - started, name, skipped=skipped)
+
+        try:
+            updated_device = self.client.write_characteristics(unique_id, changes)
+            status = DeviceResult.SUCCESS if updated_device else DeviceResult.OFFLINE
+            return DeviceResult(unique_id, status, time.monotonic() - started, name, skipped=skipped)
+        except DeviceUnavailableError as e:
+            return DeviceResult(unique_id, DeviceResult.OFFLINE, time.monotonic() - started, name, str(e), skipped)
+        except Exception as e:
+            return DeviceResult(unique_id, DeviceResult.ERROR, time.monotonic() - started, name, str(e))
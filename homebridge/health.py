@@ -0,0 +1,78 @@
+import threading
+import time
+from typing import Dict
+
+
+class DeviceUnavailableError(Exception):
+    """Raised instead of writing to a device whose circuit is open."""
+
+
+class CircuitBreaker:
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    __slots__ = ('state', 'failures', 'opened_at')
+
+    def __init__(self):
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+
+
+class DeviceHealth:
+    """
+    Per-device circuit breakers. After `failure_threshold` consecutive
+    failures (errors or values that did not stick) a device's circuit
+    opens and writes fail fast. After `reset_timeout` seconds one write
+    is let through as a probe; success closes the circuit, failure
+    re-opens it for another `reset_timeout`.
+    """
+    def __init__(self, failure_threshold: int = 3, reset_timeout: float = 30):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        self._lock = threading.Lock()
+
+    def acquire(self, uniqueId: str):
+        """
+        Call before writing to a device.
+
+        :raises DeviceUnavailableError: if the device's circuit is open,
+                                        or half-open with a probe in flight
+        """
+        with self._lock:
+            breaker = self._breakers.get(uniqueId)
+            if breaker is None or breaker.state == CircuitBreaker.CLOSED:
+                return
+            if breaker.state == CircuitBreaker.OPEN:
+                if time.monotonic() - breaker.opened_at >= self.reset_timeout:
+                    breaker.state = CircuitBreaker.HALF_OPEN
+                    return
+            retry_in = max(0.0, self.reset_timeout - (time.monotonic() - breaker.opened_at))
+            raise DeviceUnavailableError(
+                f'Device {uniqueId} is unavailable after {breaker.failures} failures; '
+                f'retrying in {retry_in:.0f}s'
+            )
+
+    def record_success(self, uniqueId: str):
+        with self._lock:
+            self._breakers.pop(uniqueId, None)
+
+    def record_failure(self, uniqueId: str):
+        with self._lock:
+            breaker = self._breakers.setdefault(uniqueId, CircuitBreaker())
+            breaker.failures += 1
+            if breaker.state == CircuitBreaker.HALF_OPEN or breaker.failures >= self.failure_threshold:
+                breaker.state = CircuitBreaker.OPEN
+                breaker.opened_at = time.monotonic()
+
+    def is_open(self, uniqueId: str) -> bool:
+        """True while writes to the device would fail fast (no side effects)."""
+        breaker = self._breakers.get(uniqueId)
+        return (breaker is not None and breaker.state == CircuitBreaker.OPEN
+                and time.monotonic() - breaker.opened_at < self.reset_timeout)
+
+    def state(self, uniqueId: str) -> str:
+        breaker = self._breakers.get(uniqueId)
+        return breaker.state if breaker else CircuitBreaker.CLOSED
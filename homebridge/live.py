@@ -0,0 +1,202 @@
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+import socketio
+
+logger = logging.getLogger(__name__)
+
+
+class AccessoryStateStore:
+    """
+    In-memory copy of every accessory's json, kept current by the
+    Homebridge UI event stream.
+
+    Writers swap in a new mapping (copy-on-write) so readers can take a
+    snapshot without locking. `version` increases on every change.
+    """
+    def __init__(self):
+        self._accessories: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        self._changed = threading.Condition(self._lock)
+        self._listeners: List[Callable[[List[Dict[str, Any]]], None]] = []
+        self.version = 0
+        self.synced = False
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        return self._accessories
+
+    def get(self, uniqueId: str) -> Optional[Dict[str, Any]]:
+        return self._accessories.get(uniqueId)
+
+    def replace(self, accessories: List[Dict[str, Any]]):
+        """Replaces the whole store, e.g. after (re)connecting."""
+        with self._lock:
+            self._accessories = {a['uniqueId']: a for a in accessories}
+            self.version += 1
+            self.synced = True
+            self._changed.notify_all()
+        self._notify(accessories)
+
+    def apply(self, accessories: List[Dict[str, Any]]):
+        """Applies pushed accessory updates on top of the current state."""
+        with self._lock:
+            updated = dict(self._accessories)
+            for a in accessories:
+                updated[a['uniqueId']] = a
+            self._accessories = updated
+            self.version += 1
+            self._changed.notify_all()
+        self._notify(accessories)
+
+    def wait_for(self, uniqueId: str, predicate: Callable[[Dict[str, Any]], bool],
+                 timeout: float) -> Optional[Dict[str, Any]]:
+        """
+        Blocks until the accessory's state satisfies `predicate` or
+        `timeout` seconds pass. Returns the matching state, or None.
+        """
+        deadline = time.monotonic() + timeout
+        with self._changed:
+            while True:
+                state = self._accessories.get(uniqueId)
+                if state is not None and predicate(state):
+                    return state
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return None
+                self._changed.wait(remaining)
+
+    def invalidate(self):
+        """Marks the store stale; readers fall back to REST until resynced."""
+        self.synced = False
+
+    def add_listener(self, callback: Callable[[List[Dict[str, Any]]], None]):
+        """`callback` is called with the changed accessories after each update."""
+        with self._lock:
+            self._listeners.append(callback)
+
+    def remove_listener(self, callback: Callable[[List[Dict[str, Any]]], None]):
+        with self._lock:
+            if callback in self._listeners:
+                self._listeners.remove(callback)
+
+    def _notify(self, accessories: List[Dict[str, Any]]):
+        for callback in list(self._listeners):
+            try:
+                callback(accessories)
+            except Exception:
+                logger.exception('accessory state listener failed')
+
+
+class AccessoryEventStream:
+    """
+    Persistent subscription to the Homebridge UI `/accessories` socket.io
+    namespace. Every (re)connect requests a full resync; pushed
+    `accessories-data` events are applied to the store as they arrive.
+
+    The first payload on a new connection is the full accessory list.
+    `accessories-reload-required` means accessories were added or
+    removed: the store stays synced (a partial push may arrive before
+    any full list, so pushes are only ever applied) and is replaced with
+    the bulk REST list, with pushes received meanwhile applied on top.
+    """
+    NAMESPACE = '/accessories'
+
+    def __init__(self, api, store: AccessoryStateStore,
+                 reconnect_delay: float = 1, max_reconnect_delay: float = 30):
+        self.api = api
+        self.store = store
+        self.reconnect_delay = reconnect_delay
+        self.max_reconnect_delay = max_reconnect_delay
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._sio: Optional[socketio.Client] = None
+        # pushes received while a REST resync is running, else None
+        self._pushed_during_resync: Optional[List[Dict[str, Any]]] = None
+        self._resync_lock = threading.Lock()
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._run, name='hb-event-stream', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        if self._sio:
+            self._sio.disconnect()
+
+    def _build_client(self) -> socketio.Client:
+        # reconnects are driven by _run so each attempt logs in with a
+        # current token instead of replaying an expired one
+        sio = socketio.Client(reconnection=False)
+
+        @sio.on('connect', namespace=self.NAMESPACE)
+        def on_connect():
+            sio.emit('get-accessories', namespace=self.NAMESPACE)
+
+        @sio.on('disconnect', namespace=self.NAMESPACE)
+        def on_disconnect(*args):
+            self.store.invalidate()
+
+        @sio.on('accessories-data', namespace=self.NAMESPACE)
+        def on_accessories_data(data):
+            with self._resync_lock:
+                if self._pushed_during_resync is not None:
+                    self._pushed_during_resync.extend(data)
+            if self.store.synced:
+                self.store.apply(data)
+            else:
+                # first payload after connecting is the full accessory list
+                self.store.replace(data)
+
+        @sio.on('accessories-reload-required', namespace=self.NAMESPACE)
+        def on_reload_required(*args):
+            # restart the bridge's monitor so added accessories push too
+            sio.emit('get-accessories', namespace=self.NAMESPACE)
+            threading.Thread(target=self.resync, name='hb-resync', daemon=True).start()
+
+        return sio
+
+    def resync(self):
+        """Replaces the store with the bridge's current accessory list."""
+        with self._resync_lock:
+            if self._pushed_during_resync is not None:
+                return
+            self._pushed_during_resync = []
+        try:
+            accessories = self.api.get('/api/accessories', fresh=True)
+        except Exception as e:
+            logger.warning('accessory resync failed: %s', e)
+            with self._resync_lock:
+                self._pushed_during_resync = None
+            return
+        with self._resync_lock:
+            current = {a['uniqueId']: a for a in accessories}
+            for a in self._pushed_during_resync:
+                if a['uniqueId'] in current:
+                    current[a['uniqueId']] = a
+            self._pushed_during_resync = None
+            self.store.replace(list(current.values()))
+
+    def _run(self):
+        delay = self.reconnect_delay
+        while not self._stopped.is_set():
+            self._sio = self._build_client()
+            try:
+                self._sio.connect(
+                    f'{self.api.host}?token={self.api.get_token()}',
+                    namespaces=[self.NAMESPACE],
+                    transports=['websocket']
+                )
+                delay = self.reconnect_delay
+                self._sio.wait()
+            except Exception as e:
+                logger.warning('accessory event stream unavailable: %s', e)
+            finally:
+                self.store.invalidate()
+
+            self._stopped.wait(delay)
+            delay = min(delay * 2, self.max_reconnect_delay)
@@ -1,4 +1,5 @@
-from typing import List, Optional, Dict
+from typing import List, Optional, Dict, Tuple
+from sys import intern
 
 # irrelevent 
 BLACKLISTED_CHARACTERISTICS = [
@@ -8,7 +9,25 @@ BLACKLISTED_CHARACTERISTICS = [
 ]
 
 
+# shared across every parsed accessory: one perms tuple per distinct
+# set, one Instance per bridge
+_perms: Dict[Tuple[str, ...], Tuple[str, ...]] = {}
+_instances: Dict[Tuple, 'Instance'] = {}
+
+def _intern(value: Optional[str]) -> Optional[str]:
+    return intern(value) if isinstance(value, str) else value
+
+def _intern_perms(perms: List[str]) -> Tuple[str, ...]:
+    key = tuple(perms)
+    return _perms.setdefault(key, tuple(intern(p) for p in key))
+
+
 class ServiceCharacteristic:
+    __slots__ = (
+        'aid', 'iid', 'uuid', 'type', 'serviceType', 'serviceName', 'description', 'value',
+        'format', 'perms', 'canRead', 'canWrite', 'ev', 'maxValue', 'minValue', 'minStep', 'unit'
+    )
+
     def __init__(self, aid: int, iid: int, uuid: str, type: str, serviceType: str, serviceName: str, 
                  description: str, value, format: str, perms: List[str], canRead: bool, 
                  canWrite: bool, ev: bool, maxValue: Optional[int] = None, 
@@ -36,24 +55,26 @@ class ServiceCharacteristic:
         return cls(
             aid=data['aid'],
             iid=data['iid'],
-            uuid=data['uuid'],
-            type=data['type'],
-            serviceType=data['serviceType'],
+            uuid=intern(data['uuid']),
+            type=intern(data['type']),
+            serviceType=intern(data['serviceType']),
             serviceName=data['serviceName'],
-            description=data['description'],
+            description=intern(data['description']),
             value=data.get('value'),
-            format=data['format'],
-            perms=data['perms'],
+            format=intern(data['format']),
+            perms=_intern_perms(data['perms']),
             canRead=data['canRead'],
             canWrite=data['canWrite'],
             ev=data['ev'],
             maxValue=data.get('maxValue'),
             minValue=data.get('minValue'),
             minStep=data.get('minStep'),
-            unit=data.get('unit')
+            unit=_intern(data.get('unit'))
         )
 
 class AccessoryInformation:
+    __slots__ = ('Manufacturer', 'Model', 'Name', 'Serial_Number', 'Firmware_Revision', 'Configured_Name')
+
     def __init__(self, Manufacturer: str, Model: str, Name: str, Serial_Number: str, Firmware_Revision: str, Configured_Name: str):
         self.Manufacturer = Manufacturer
         self.Model = Model
@@ -65,15 +86,22 @@ class AccessoryInformation:
     @classmethod
     def from_dict(cls, data: Dict):
         return cls(
-            Manufacturer=data['Manufacturer'],
-            Model=data['Model'],
+            Manufacturer=_intern(data['Manufacturer']),
+            Model=_intern(data['Model']),
             Name=data['Name'],
             Serial_Number=data['Serial Number'],
-            Firmware_Revision=data['Firmware Revision'],
+            Firmware_Revision=_intern(data['Firmware Revision']),
             Configured_Name=data.get('Configured Name')
         )
 
 class Instance:
+    """
+    The bridge an accessory is published on. Every accessory on a bridge
+    shares one Instance, identified by the bridge's username/address;
+    its other fields are updated in place from the latest payload.
+    """
+    __slots__ = ('name', 'username', 'ipAddress', 'port', 'services', 'connectionFailedCount')
+
     def __init__(self, name: str, username: str, ipAddress: str, port: int, services: List, connectionFailedCount: int):
         self.name = name
         self.username = username
@@ -84,16 +112,30 @@ class Instance:
 
     @classmethod
     def from_dict(cls, data: Dict):
-        return cls(
-            name=data['name'],
-            username=data['username'],
-            ipAddress=data['ipAddress'],
-            port=data['port'],
-            services=data['services'],
-            connectionFailedCount=data['connectionFailedCount']
-        )
+        key = (data['username'], data['ipAddress'], data['port'])
+        instance = _instances.get(key)
+        if instance is None:
+            return _instances.setdefault(key, cls(
+                name=intern(data['name']),
+                username=intern(data['username']),
+                ipAddress=intern(data['ipAddress']),
+                port=data['port'],
+                services=data['services'],
+                connectionFailedCount=data['connectionFailedCount']
+            ))
+        if instance.name != data['name']:
+            instance.name = intern(data['name'])
+        instance.services = data['services']
+        instance.connectionFailedCount = data['connectionFailedCount']
+        return instance
 
 class Device:
+    __slots__ = (
+        'aid', 'iid', 'uuid', 'type', 'humanType', 'serviceName', 'serviceCharacteristics',
+        'accessoryInformation', 'values', 'instance', 'uniqueId', 'changed_characteristics',
+        '_characteristics_by_type'
+    )
+
     def __init__(self, aid: int, iid: int, uuid: str, type: str, humanType: str, serviceName: str, 
                  serviceCharacteristics: List[ServiceCharacteristic], accessoryInformation: AccessoryInformation, 
                  values: dict, instance: Instance, uniqueId: str):
@@ -109,6 +151,10 @@ class Device:
         self.instance = instance
         self.uniqueId = uniqueId
         self.changed_characteristics = []
+        # characteristic type -> characteristic, first one wins like the old scan
+        self._characteristics_by_type: Dict[str, ServiceCharacteristic] = {}
+        for c in reversed(serviceCharacteristics):
+            self._characteristics_by_type[c.type] = c
 
 
     def get_characteristics(self) -> List[Dict]:
@@ -129,7 +175,7 @@ class Device:
         :param value: The new value for the characteristic
         :raises ValueError: If validation fails
         """
-        characteristic = next((c for c in self.serviceCharacteristics if c.type == characteristicType), None)
+        characteristic = self._characteristics_by_type.get(characteristicType)
         
         if not characteristic:
             raise ValueError(f"Characteristic {characteristicType} not found.")
@@ -251,9 +297,9 @@ class Device:
         return cls(
             aid=data['aid'],
             iid=data['iid'],
-            uuid=data['uuid'],
-            type=data['type'],
-            humanType=data['humanType'],
+            uuid=intern(data['uuid']),
+            type=intern(data['type']),
+            humanType=intern(data['humanType']),
             serviceName=data['serviceName'],
             serviceCharacteristics=service_characteristics,
             accessoryInformation=accessory_info,
@@ -264,6 +310,8 @@ class Device:
     
 
 class ServiceIdentifier:
+    __slots__ = ('uniqueId', 'aid', 'iid', 'uuid')
+
     def __init__(self, uniqueId: str, aid: int, iid: int, uuid: str):
         self.uniqueId = uniqueId
         self.aid = aid
@@ -288,6 +336,8 @@ class ServiceIdentifier:
         }
 
 class Room:
+    __slots__ = ('name', 'services')
+
     def __init__(self, name: str, services: list):
         self.name = name
         self.services = [ServiceIdentifier.from_dict(service) for service in services]
@@ -0,0 +1,59 @@
+"""
+Per-request span recording. Spans are only kept while a trace is active
+on the current thread, so instrumented code costs one thread-local
+lookup otherwise.
+Work handed to other threads (action runs, coalesced writes) is not
+captured.
+"""
+import threading
+import time
+from contextlib import contextmanager
+from typing import List, Optional
+
+_local = threading.local()
+
+
+class Trace:
+    def __init__(self):
+        self.started = time.perf_counter()
+        # (name, start offset s, duration s, depth)
+        self.spans: List[tuple] = []
+        self.depth = 0
+
+
+def start() -> Trace:
+    _local.trace = Trace()
+    return _local.trace
+
+
+def stop() -> Optional[Trace]:
+    trace = getattr(_local, 'trace', None)
+    _local.trace = None
+    return trace
+
+
+def active() -> bool:
+    return getattr(_local, 'trace', None) is not None
+
+
+def record(name: str, started: float, duration: float):
+    """Adds a span measured elsewhere (perf_counter start, seconds)."""
+    trace = getattr(_local, 'trace', None)
+    if trace is not None:
+        trace.spans.append((name, started - trace.started, duration, trace.depth + 1))
+
+
+@contextmanager
+def span(name: str):
+    trace = getattr(_local, 'trace', None)
+    if trace is None:
+        yield
+        return
+    started = time.perf_counter()
+    trace.depth += 1
+    depth = trace.depth
+    try:
+        yield
+    finally:
+        trace.depth -= 1
+        trace.spans.append((name, started - trace.started, time.perf_counter() - started, depth))
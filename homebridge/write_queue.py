@@ -0,0 +1,64 @@
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Set
+
+from homebridge.client import HomeBridgeClient
+from homebridge.health import DeviceUnavailableError
+from homebridge.models import Device
+
+logger = logging.getLogger(__name__)
+
+
+class WriteCoalescer:
+    """
+    Per-device write queue. Changes submitted while a device's write is
+    in flight are merged (last writer wins per characteristic) and sent
+    as one write once it completes, so each device has at most one write
+    in flight no matter how fast a slider is dragged. Changes are
+    validated once, on submit; flushes send them as they are.
+    """
+    def __init__(self, client: HomeBridgeClient, max_workers: int = 8):
+        self.client = client
+        self._pending: Dict[str, Dict[str, Any]] = {}
+        self._inflight: Set[str] = set()
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='hb-coalesce')
+
+    def submit(self, unique_id: str, characteristics: Dict[str, Any]) -> Device:
+        """
+        Validates `characteristics` against the device and queues them.
+
+        :returns: the device with the queued values applied
+        :raises ValueError: if validation fails; nothing is queued
+        :raises DeviceUnavailableError: if the device's circuit is open
+        """
+        if self.client.health.is_open(unique_id):
+            raise DeviceUnavailableError(f'Device {unique_id} is unavailable')
+        device = self.client.get_accessory(unique_id)
+        for char_type, value in characteristics.items():
+            device.set_characteristic(char_type, value)
+        validated = {c['characteristicType']: c['value'] for c in device.get_changed_characteristics()}
+
+        with self._lock:
+            self._pending.setdefault(unique_id, {}).update(validated)
+            if unique_id not in self._inflight:
+                self._inflight.add(unique_id)
+                self._pool.submit(self._drain, unique_id)
+        return device
+
+    def _drain(self, unique_id: str):
+        while True:
+            with self._lock:
+                updates = self._pending.pop(unique_id, None)
+                if not updates:
+                    self._inflight.discard(unique_id)
+                    return
+            changes = [{'characteristicType': t, 'value': v} for t, v in updates.items()]
+            try:
+                if self.client.write_characteristics(unique_id, changes) is None:
+                    logger.warning('write to %s not confirmed; device might be offline', unique_id)
+            except DeviceUnavailableError as e:
+                logger.warning('write to %s dropped: %s', unique_id, e)
+            except Exception:
+                logger.exception('write to %s failed', unique_id)
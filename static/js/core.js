@@ -2,27 +2,123 @@ function isDebug() { return (new URLSearchParams(window.location.search)).get('d
 function recordingAction() { return (new URLSearchParams(window.location.search)).get('recordAction'); }
 
 
+// last known state of each device on the page, keyed by uniqueId
+var loadedDevices = {};
+
 function loadDevice(uniqueId, deviceType) {
     $.get('/api/device/' + uniqueId, function(data) {
-        var controlsDiv = $('#controls-' + uniqueId);
-        $.getScript('/static/js/devices/' + deviceType + '.js', function() {
-            initDeviceControls(data, controlsDiv);
-            if (isDebug()) 
-                debugTable(data.serviceCharacteristics, controlsDiv);
-        });
+        loadedDevices[uniqueId] = data;
+        renderDevice(data, deviceType);
     });
 }
 
-function initDevice(device) {
-    var controlsDiv = $('#controls-' + device.uniqueId);
-    $.getScript('/static/js/devices/' + device.type + '.js', function() {
-        initDeviceControls(device, controlsDiv);
+// several devices in one request, e.g. loadDevices({room: 'Kitchen'}) or
+// loadDevices({ids: uniqueIds.join(',')})
+function loadDevices(query) {
+    return $.get('/api/devices', query, showDevices);
+}
+
+// renders devices already fetched, e.g. embedded in the page
+function showDevices(devices) {
+    for (let data of devices) {
+        loadedDevices[data.uniqueId] = data;
+        renderDevice(data, data.type);
+    }
+}
+
+// control initialisers per device type, registered by static/js/devices/<type>.js
+var deviceControls = {};
+var deviceScriptLoads = {};
+
+function registerDeviceControls(deviceType, init) {
+    deviceControls[deviceType] = init;
+}
+
+// loads a device type's script at most once; the room page usually
+// includes them already. Fingerprinted URLs (deviceScriptUrls, set in
+// base.html) are cached by the browser, so no cache-busting here.
+function loadDeviceScript(deviceType) {
+    if (deviceControls[deviceType]) return $.when();
+    if (!deviceScriptLoads[deviceType]) {
+        var url = (window.deviceScriptUrls || {})[deviceType] || '/static/js/devices/' + deviceType + '.js';
+        deviceScriptLoads[deviceType] = $.ajax({url: url, dataType: 'script', cache: true})
+            .fail(function() { delete deviceScriptLoads[deviceType]; });
+    }
+    return deviceScriptLoads[deviceType];
+}
+
+function renderDevice(data, deviceType) {
+    var controlsDiv = $('#controls-' + data.uniqueId);
+    loadDeviceScript(deviceType).then(function() {
+        deviceControls[deviceType](data, controlsDiv);
         if (isDebug()) 
-            debugTable(device.serviceCharacteristics, controlsDiv);
+            debugTable(data.serviceCharacteristics, controlsDiv);
     });
 }
 
-var antiFloodTimeout = null;
+// devices whose controls were left alone while the user was using them
+var deferredRenders = {};
+
+function isInteracting(uniqueId) {
+    return uniqueId in pendingUpdates || uniqueId in antiFloodTimeouts ||
+        $('#controls-' + uniqueId).find(':focus, :active').length > 0;
+}
+
+// re-renders a device's controls, unless that would replace a control
+// the user is in the middle of changing; then it waits until they're done
+function refreshDevice(uniqueId) {
+    var device = loadedDevices[uniqueId];
+    if (!device) return;
+    if (isInteracting(uniqueId)) {
+        deferredRenders[uniqueId] = true;
+        return;
+    }
+    delete deferredRenders[uniqueId];
+    renderDevice(device, device.type);
+}
+
+$(document).on('focusout', '[id^="controls-"]', function() {
+    var uniqueId = this.id.substring('controls-'.length);
+    // focus moves after focusout fires
+    setTimeout(function() {
+        if (deferredRenders[uniqueId]) refreshDevice(uniqueId);
+    }, 0);
+});
+
+function subscribeDeviceEvents(uniqueIds) {
+    // server pushes only the values that changed for these devices
+    var source = new EventSource('/api/events?ids=' + uniqueIds.join(','));
+    source.onmessage = function(event) {
+        var delta = JSON.parse(event.data);
+        var device = loadedDevices[delta.uniqueId];
+        if (!device) return;
+        Object.assign(device.values, delta.values);
+        for (let c of device.serviceCharacteristics) {
+            if (c.type in delta.values) c.value = delta.values[c.type];
+        }
+        // echoes of this page's own writes are already on screen
+        var sent = sentValues[delta.uniqueId] || {};
+        var external = false;
+        for (let t in delta.values) {
+            if (sent[t] != delta.values[t]) {
+                external = true;
+                delete sent[t];
+            }
+        }
+        if (external || deferredRenders[delta.uniqueId]) refreshDevice(delta.uniqueId);
+    };
+    return source;
+}
+
+function initDevice(device) {
+    renderDevice(device, device.type);
+}
+
+// per-device debounce timers and the changes waiting on them
+var antiFloodTimeouts = {};
+var pendingUpdates = {};
+// last values this page wrote to each device
+var sentValues = {};
 function updateDevice(uniqueId, characteristics) {
     function doUpdate(uniqueId, characteristics) {
         $.ajax({
@@ -30,6 +126,9 @@ function updateDevice(uniqueId, characteristics) {
             type: 'POST',
             contentType: 'application/json',
             data: JSON.stringify(characteristics),
+            complete: function() {
+                if (deferredRenders[uniqueId]) refreshDevice(uniqueId);
+            },
             success: function(response) {
                 console.log('Device updated', response);
                 if (recordingAction()) {
@@ -45,13 +144,19 @@ function updateDevice(uniqueId, characteristics) {
         });
     }
 
-    // Clear previous timeout to debounce the calls
-    if (antiFloodTimeout) {
-        clearTimeout(antiFloodTimeout);
+    // Merge into this device's pending changes and debounce per device,
+    // so quick changes to different devices or characteristics aren't dropped
+    pendingUpdates[uniqueId] = Object.assign(pendingUpdates[uniqueId] || {}, characteristics);
+    sentValues[uniqueId] = Object.assign(sentValues[uniqueId] || {}, characteristics);
+    if (antiFloodTimeouts[uniqueId]) {
+        clearTimeout(antiFloodTimeouts[uniqueId]);
     }
 
-    antiFloodTimeout = setTimeout(() => {
-        doUpdate(uniqueId, characteristics);
+    antiFloodTimeouts[uniqueId] = setTimeout(() => {
+        let pending = pendingUpdates[uniqueId];
+        delete pendingUpdates[uniqueId];
+        delete antiFloodTimeouts[uniqueId];
+        doUpdate(uniqueId, pending);
     }, 200); 
 }
 
@@ -1,5 +1,5 @@
 
-function initDeviceControls(data, controlsDiv) {
+registerDeviceControls('GarageDoorOpener', function(data, controlsDiv) {
     var targetDoorState = data.values['TargetDoorState'];
     var currentDoorState = data.values['CurrentDoorState'];
     var obstructionDetected = data.values['ObstructionDetected'];
@@ -16,6 +16,6 @@ function initDeviceControls(data, controlsDiv) {
         var newValue = parseInt($(this).val());
         updateDevice(data.uniqueId, {'TargetDoorState': newValue});
     });
-}
+});
 
 
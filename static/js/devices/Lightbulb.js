@@ -1,5 +1,5 @@
 
-function initDeviceControls(data, controlsDiv) {
+registerDeviceControls('Lightbulb', function(data, controlsDiv) {
     var onCharacteristic = data.values['On'];
     var brightnessCharacteristic = data.values['Brightness'];
     var hueCharacteristic = data.values['Hue'];
@@ -42,7 +42,7 @@ function initDeviceControls(data, controlsDiv) {
         updateDevice(data.uniqueId, {'Hue': hsl.h, 'Saturation': hsl.s});
     });
     
-}
+});
 
 function hslToHex(h, s, l){
     const hsl = `hsl(${h},${s},${l})`;
@@ -1,5 +1,5 @@
 
-function initDeviceControls(data, controlsDiv) {
+registerDeviceControls('Switch', function(data, controlsDiv) {
     var onCharacteristic = data.values['On'];
 
     var switchHtml = '<div class="form-check form-switch">' +
@@ -14,5 +14,5 @@ function initDeviceControls(data, controlsDiv) {
         var newValue = $(this).is(':checked') ? 1 : 0;
         updateDevice(data.uniqueId, {'On': newValue});
     });
-}
+});
 
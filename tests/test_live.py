@@ -0,0 +1,98 @@
+"""
+AccessoryEventStream against MockHomebridge's socket.io namespace.
+Needs requirements-dev.txt (python-socketio and simple-websocket).
+"""
+import threading
+import time
+
+import pytest
+
+from bench.mock_homebridge import MockHomebridge
+from homebridge.client import HomeBridgeAPI
+from homebridge.live import AccessoryEventStream, AccessoryStateStore
+
+ACCESSORIES = 12
+
+
+def wait_until(predicate, timeout=5):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+@pytest.fixture
+def live():
+    mock = MockHomebridge(ACCESSORIES, live=True)
+    mock.start()
+    store = AccessoryStateStore()
+    stream = AccessoryEventStream(HomeBridgeAPI(mock.url, 'test', 'test'), store, reconnect_delay=0.05)
+    stream.start()
+    assert wait_until(lambda: store.synced), 'initial sync did not arrive'
+    yield mock, store
+    stream.stop()
+    mock.stop()
+
+
+def switch_id(mock):
+    return next(i for i, a in mock.accessories.items() if a['type'] == 'Switch')
+
+
+def test_initial_sync_and_push(live):
+    mock, store = live
+    assert len(store.snapshot()) == ACCESSORIES
+
+    unique_id = switch_id(mock)
+    mock.set_value(unique_id, 'On', True)
+    assert wait_until(lambda: store.get(unique_id)['values']['On'] is True)
+    assert len(store.snapshot()) == ACCESSORIES
+
+
+def test_reload_required_keeps_full_store(live):
+    mock, store = live
+    seen = []
+    lock = threading.Lock()
+
+    def record(accessories):
+        with lock:
+            seen.append((store.synced, len(store.snapshot())))
+
+    store.add_listener(record)
+    version = store.version
+    unique_id = switch_id(mock)
+    # a partial push racing the reply to the client's get-accessories
+    mock.reload_required()
+    mock.set_value(unique_id, 'On', True)
+
+    # the push and the full list
+    assert wait_until(lambda: store.version >= version + 2)
+    assert store.get(unique_id)['values']['On'] is True
+    with lock:
+        assert seen and all(entry == (True, ACCESSORIES) for entry in seen), seen
+
+
+def test_reload_required_drops_removed_accessories(live):
+    mock, store = live
+    removed = switch_id(mock)
+    mock.remove_accessory(removed)
+    mock.reload_required()
+
+    assert wait_until(lambda: store.get(removed) is None), 'removed accessory still in the store'
+    assert store.synced
+    assert len(store.snapshot()) == ACCESSORIES - 1
+
+
+def test_reconnect_resyncs(live):
+    mock, store = live
+    unique_id = switch_id(mock)
+    mock.disconnect_clients()
+    assert wait_until(lambda: not store.synced)
+
+    # changed while the client was away: only a resync can pick it up
+    mock.set_value(unique_id, 'On', True, push=False)
+
+    assert wait_until(lambda: store.synced), 'did not reconnect'
+    assert store.get(unique_id)['values']['On'] is True
+    assert len(store.snapshot()) == ACCESSORIES
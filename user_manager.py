@@ -1,61 +1,185 @@
+import hashlib
 import json
 import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
 from werkzeug.security import generate_password_hash, check_password_hash
 
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS users (
+    username TEXT PRIMARY KEY,
+    password TEXT NOT NULL,
+    usertype INTEGER NOT NULL DEFAULT 1
+);
+CREATE TABLE IF NOT EXISTS api_keys (
+    key_hash TEXT PRIMARY KEY,
+    key_hint TEXT NOT NULL,
+    username TEXT NOT NULL REFERENCES users(username) ON DELETE CASCADE
+);
+CREATE INDEX IF NOT EXISTS api_keys_username ON api_keys(username);
+'''
+
+def hash_api_key(api_key: str) -> str:
+    # keys are random uuid4s, so a fast unsalted digest is enough
+    return hashlib.sha256(api_key.encode()).hexdigest()
+
+
+class ApiKeyCache:
+    """
+    Bounded LRU of verified key digests -> username. Entries expire
+    after `ttl` seconds, which also bounds how long a key revoked by
+    another worker process keeps working here.
+    """
+    def __init__(self, max_entries: int = 1024, ttl: float = 60):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: 'OrderedDict[str, tuple]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key_hash: str):
+        with self._lock:
+            entry = self._entries.get(key_hash)
+            if entry is None:
+                return None
+            username, expires = entry
+            if time.monotonic() > expires:
+                del self._entries[key_hash]
+                return None
+            self._entries.move_to_end(key_hash)
+            return username
+
+    def set(self, key_hash: str, username: str):
+        with self._lock:
+            self._entries[key_hash] = (username, time.monotonic() + self.ttl)
+            self._entries.move_to_end(key_hash)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, key_hash: str = None, username: str = None):
+        with self._lock:
+            if key_hash is not None:
+                self._entries.pop(key_hash, None)
+            if username is not None:
+                for k in [k for k, (u, _) in self._entries.items() if u == username]:
+                    del self._entries[k]
+
+# shared by every UserManager in the process so a revocation through
+# one instance is seen by the others
+api_key_cache = ApiKeyCache()
+
 class UserManager:
-    def __init__(self, auth_file='auth.json'):
-        self.auth_file = auth_file
-        self.data = {
-            "users": {},
-            "api_keys": {}
-        }
-        if os.path.exists(self.auth_file):
-            with open(self.auth_file, 'r') as f:
-                self.data = json.load(f)
-        else:
-            self.save_data()
-
-    def save_data(self):
-        with open(self.auth_file, 'w') as f:
-            json.dump(self.data, f, indent=4)
+    """
+    Users and API keys stored in SQLite. Every write is its own
+    transaction and every read hits the database, so changes made by one
+    instance (or worker process) are visible to all others immediately.
+    """
+    def __init__(self, db_file='auth.db', legacy_auth_file='auth.json'):
+        self.db_file = db_file
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.executescript(SCHEMA)
+        self._migrate(legacy_auth_file)
+
+    def _connect(self) -> sqlite3.Connection:
+        # sqlite connections can't be shared across threads; keep one per thread
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_file, timeout=10)
+            conn.row_factory = sqlite3.Row
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA foreign_keys=ON')
+            self._local.conn = conn
+        return conn
+
+    def _migrate(self, legacy_auth_file):
+        """One-time import of the old auth.json store, renamed once imported."""
+        if not legacy_auth_file or not os.path.exists(legacy_auth_file):
+            return
+        with open(legacy_auth_file, 'r') as f:
+            data = json.load(f)
+        with self._connect() as conn:
+            conn.executemany(
+                'INSERT OR IGNORE INTO users (username, password, usertype) VALUES (?, ?, ?)',
+                [(u, v['password'], v['usertype']) for u, v in data.get('users', {}).items()]
+            )
+            conn.executemany(
+                'INSERT OR IGNORE INTO api_keys (key_hash, key_hint, username) VALUES (?, ?, ?)',
+                [(hash_api_key(k), k[-4:], u) for k, u in data.get('api_keys', {}).items() if u in data.get('users', {})]
+            )
+        try:
+            os.replace(legacy_auth_file, legacy_auth_file + '.migrated')
+        except FileNotFoundError:
+            # another worker process migrated it at the same time
+            pass
 
     def add_user(self, username, password, usertype=1):
-        self.data['users'][username] = {
-            'password': password,
-            'usertype': usertype
-        }
-        self.save_data()
+        with self._connect() as conn:
+            # upsert rather than REPLACE, which would cascade-delete the user's keys
+            conn.execute(
+                'INSERT INTO users (username, password, usertype) VALUES (?, ?, ?) '
+                'ON CONFLICT(username) DO UPDATE SET password = excluded.password, usertype = excluded.usertype',
+                (username, password, usertype)
+            )
 
     def remove_user(self, username):
-        if username in self.data['users']:
-            del self.data['users'][username]
-            # Also remove API keys associated with this user
-            self.data['api_keys'] = {k: v for k, v in self.data['api_keys'].items() if v != username}
-            self.save_data()
+        # API keys associated with this user go with it (ON DELETE CASCADE)
+        with self._connect() as conn:
+            conn.execute('DELETE FROM users WHERE username = ?', (username,))
+        api_key_cache.invalidate(username=username)
 
     def authenticate_user(self, username, password):
-        user = self.data['users'].get(username)
+        user = self.get_user(username)
         if user and user['usertype'] > 0:
             return user['password'] == password
         return False
 
     def get_user(self, username):
-        return self.data['users'].get(username)
+        row = self._connect().execute(
+            'SELECT password, usertype FROM users WHERE username = ?', (username,)
+        ).fetchone()
+        return dict(row) if row else None
 
     def list_users(self):
-        return self.data['users']
+        rows = self._connect().execute('SELECT username, password, usertype FROM users ORDER BY username')
+        return {r['username']: {'password': r['password'], 'usertype': r['usertype']} for r in rows}
 
     def add_api_key(self, username, api_key):
-        self.data['api_keys'][api_key] = username
-        self.save_data()
+        """Stores only the key's digest and last 4 characters."""
+        with self._connect() as conn:
+            conn.execute(
+                'INSERT OR REPLACE INTO api_keys (key_hash, key_hint, username) VALUES (?, ?, ?)',
+                (hash_api_key(api_key), api_key[-4:], username)
+            )
 
     def remove_api_key(self, api_key):
-        if api_key in self.data['api_keys']:
-            del self.data['api_keys'][api_key]
-            self.save_data()
+        self.remove_api_key_hash(hash_api_key(api_key))
+
+    def remove_api_key_hash(self, key_hash, username=None):
+        """Revokes a key by digest, optionally only if it belongs to `username`."""
+        with self._connect() as conn:
+            if username is None:
+                conn.execute('DELETE FROM api_keys WHERE key_hash = ?', (key_hash,))
+            else:
+                conn.execute('DELETE FROM api_keys WHERE key_hash = ? AND username = ?', (key_hash, username))
+        api_key_cache.invalidate(key_hash=key_hash)
 
     def get_username_for_api_key(self, api_key):
-        return self.data['api_keys'].get(api_key)
+        key_hash = hash_api_key(api_key)
+        username = api_key_cache.get(key_hash)
+        if username is None:
+            row = self._connect().execute(
+                'SELECT username FROM api_keys WHERE key_hash = ?', (key_hash,)
+            ).fetchone()
+            if row:
+                username = row['username']
+                api_key_cache.set(key_hash, username)
+        return username
 
     def list_api_keys_for_user(self, username):
-        return [k for k, v in self.data['api_keys'].items() if v == username]
+        """Returns `{'key_hash', 'key_hint'}` for each of the user's keys."""
+        rows = self._connect().execute(
+            'SELECT key_hash, key_hint FROM api_keys WHERE username = ?', (username,)
+        )
+        return [dict(r) for r in rows]